@@ -1,19 +1,30 @@
 import streamlit as st
 import pandas as pd
 import os
-import pytz
-from datetime import datetime
-from PyPDF2 import PdfReader
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import sys
+import time
+
+import crm_data
+import crm_documents
+import crm_metrics
+import crm_service as service
+import crm_state
+
+render_started = time.perf_counter()
+
+# Old login logs and attendance are archived in a background thread; with a state server, the server does this
+if service.store is not None:
+    service.start_background_compaction()
+
+# The Performance page's numbers for Prometheus; the API process serves its own at /metrics
+if os.environ.get("CRM_METRICS_PORT"):
+    crm_metrics.serve_http(int(os.environ["CRM_METRICS_PORT"]), os.environ.get("CRM_METRICS_HOST", "127.0.0.1"))
+
+# PyPDF2, smtplib/email, openpyxl (crm_import/crm_export) are only imported by the functions that use them,
+# and crm_service reads a table only when a page first touches it, so the login page stays cheap.
+LAZY_MODULES = ["PyPDF2", "smtplib", "email.mime.multipart", "crm_import", "crm_export", "openpyxl"]
 
 # File paths
-users_file = "users.csv"
-tasks_file = "tasks.csv"
-log_file = "login_logout.csv"
-leave_file = "leave_applications.csv"
-attendance_file = "attendance.csv"
 employee_directory = "employee_details/"
 resume_directory = "resumes/"
 
@@ -23,39 +34,6 @@ if not os.path.exists(employee_directory):
 if not os.path.exists(resume_directory):
     os.makedirs(resume_directory)
 
-# Initialize files and data
-try:
-    users = pd.read_csv(users_file).set_index("Username").to_dict("index")
-except FileNotFoundError:
-    users = {"admin": {"password": "admin123", "role": "admin"}}
-    pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file,
-                                                                                                             index=False)
-
-try:
-    tasks_data = pd.read_csv(tasks_file)
-except FileNotFoundError:
-    tasks_data = pd.DataFrame(
-        columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
-    tasks_data.to_csv(tasks_file, index=False)
-
-try:
-    log_data = pd.read_csv(log_file)
-except FileNotFoundError:
-    log_data = pd.DataFrame(columns=["Username", "Action", "Timestamp"])
-    log_data.to_csv(log_file, index=False)
-
-try:
-    leave_data = pd.read_csv(leave_file)
-except FileNotFoundError:
-    leave_data = pd.DataFrame(columns=["Employee Name", "Leave Type", "Start Date", "End Date", "Status"])
-    leave_data.to_csv(leave_file, index=False)
-
-try:
-    attendance_data = pd.read_csv(attendance_file)
-except FileNotFoundError:
-    attendance_data = pd.DataFrame(columns=["Username", "Date", "Check-In Time", "Check-Out Time", "Status"])
-    attendance_data.to_csv(attendance_file, index=False)
-
 # Session state variables
 if "current_user" not in st.session_state:
     st.session_state.current_user = None
@@ -67,89 +45,20 @@ if "refresh" not in st.session_state:
     st.session_state.refresh = False
 
 
-# Helper functions
-def login(username, password):
-    return users[username]["role"] if username in users and users[username]["password"] == password else None
-
-
-def record_action(username, action):
-    global log_data
-    india_timezone = pytz.timezone('Asia/Kolkata')
-    timestamp = datetime.now(india_timezone).strftime("%Y-%m-%d %H:%M:%S")
-    new_entry = pd.DataFrame({"Username": [username], "Action": [action], "Timestamp": [timestamp]})
-    log_data = pd.concat([log_data, new_entry], ignore_index=True)
-    log_data.to_csv(log_file, index=False)
-
-
-def delete_task_data(delete_all=False, index=None):
-    global tasks_data
-    if delete_all:
-        tasks_data = pd.DataFrame(
-            columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
-    elif index is not None:
-        tasks_data = tasks_data.drop(index=index).reset_index(drop=True)
-    tasks_data.to_csv(tasks_file, index=False)
-
-
-def delete_user(username):
-    if username in users:
-        del users[username]
-        pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(
-            users_file, index=False)
-        return True
-    return False
-
-
-def delete_all_login_logout_details():
-    global log_data
-    log_data = pd.DataFrame(columns=["Username", "Action", "Timestamp"])
-    log_data.to_csv(log_file, index=False)
-
-
-def filter_login_details(username=None, start_date=None, end_date=None):
-    filtered_data = log_data
-    if username:
-        filtered_data = filtered_data[filtered_data["Username"] == username]
-    if start_date:
-        filtered_data = filtered_data[filtered_data["Timestamp"] >= str(start_date)]
-    if end_date:
-        filtered_data = filtered_data[filtered_data["Timestamp"] <= str(end_date)]
-    return filtered_data
-
-
-def daily_logs():
-    today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
-    today_logs = log_data[log_data["Timestamp"].str.startswith(str(today))]
-    return today_logs
-
-
-def apply_for_leave(employee_name, leave_type, start_date, end_date):
-    global leave_data
-    new_application = pd.DataFrame([[employee_name, leave_type, start_date, end_date, "Pending"]],
-                                   columns=["Employee Name", "Leave Type", "Start Date", "End Date", "Status"])
-    leave_data = pd.concat([leave_data, new_application], ignore_index=True)
-    leave_data.to_csv(leave_file, index=False)
-
-
+# Pages
 def manage_leave_applications():
-    global leave_data
     st.title("Leave Applications")
     st.subheader("Pending Leave Applications")
-    pending_leaves = leave_data[leave_data["Status"] == "Pending"]
+    pending_leaves = service.pending_leaves()
     if not pending_leaves.empty:
         st.dataframe(pending_leaves)
         selected_application = st.selectbox("Select Application to Manage", pending_leaves.index)
         action = st.selectbox("Select Action", ["Accept", "Reject"])
         if st.button("Submit Action"):
-            if action == "Accept":
-                leave_data.at[selected_application, "Status"] = "Accepted"
-                st.success("Leave application accepted!")
-                send_email_notification(leave_data.at[selected_application, "Employee Name"], "Accepted")
-            else:
-                leave_data.at[selected_application, "Status"] = "Rejected"
-                st.success("Leave application rejected!")
-                send_email_notification(leave_data.at[selected_application, "Employee Name"], "Rejected")
-            leave_data.to_csv(leave_file, index=False)
+            status = "Accepted" if action == "Accept" else "Rejected"
+            employee_name = service.update_leave_status(selected_application, status)
+            st.success(f"Leave application {status.lower()}!")
+            send_email_notification(employee_name, status)
     else:
         st.info("No pending leave applications.")
 
@@ -158,17 +67,20 @@ def send_email_notification(employee_name, status):
     employee_email = f"{employee_name}@gmail.com"
     subject = "Leave Application Status"
     body = f"Your leave application has been {status}."
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
     msg = MIMEMultipart()
     msg['From'] = "your_email@gmail.com"  # Replace with your email
     msg['To'] = employee_email
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
     try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
+        with crm_metrics.span("smtp send"), smtplib.SMTP('smtp.gmail.com', 587) as server:
             server.starttls()
             server.login("your_email@gmail.com", "your_email_password")  # Replace with your email and password
             server.send_message(msg)
-            st.success(f"Email notification sent to {employee_name}.")
+        st.success(f"Email notification sent to {employee_name}.")
     except Exception as e:
         st.error(f"Failed to send email: {e}")
 
@@ -176,7 +88,7 @@ def send_email_notification(employee_name, status):
 def employee_leave_status():
     st.title("Leave Status Overview")
     employee_name = st.session_state.current_user
-    employee_leaves = leave_data[leave_data["Employee Name"] == employee_name]
+    employee_leaves = service.employee_leaves(employee_name)
     if not employee_leaves.empty:
         for index, row in employee_leaves.iterrows():
             with st.expander(f"Leave Application: {row['Leave Type']}"):
@@ -187,42 +99,77 @@ def employee_leave_status():
         st.info("No leave applications found.")
 
 
-def record_attendance(username, action):
-    global attendance_data
-    india_timezone = pytz.timezone('Asia/Kolkata')
-    today = datetime.now(india_timezone).date()
-    current_time = datetime.now(india_timezone).strftime("%H:%M:%S")
+def team_availability_page():
+    st.title("Team Availability")
+    if st.session_state.role != "admin":
+        st.error("You do not have permission to access this section.")
+        return
+    col1, col2 = st.columns(2)
+    start_date = col1.date_input("From")
+    end_date = col2.date_input("To", value=start_date)
+    employees = service.employee_names()
+    team = st.multiselect("Team (all employees if empty)", employees)
+    include_absences = st.checkbox("Count days without attendance as absent")
+    if end_date < start_date:
+        st.error("'To' cannot be before 'From'.")
+        return
+    availability = service.team_availability(start_date, end_date, team or employees, include_absences)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Team Size", availability["employees"])
+    col2.metric("Out", availability["out"])
+    col3.metric("Available", availability["available"])
+    st.subheader("On Leave")
+    st.dataframe(service.on_leave(start_date, end_date, team or None))
+    if include_absences:
+        st.subheader("Absent")
+        st.dataframe(service.absences(start_date, end_date, team or None))
+
+
+def mark_attendance(action):
+    ok, message = service.record_attendance(st.session_state.current_user, action)
+    if ok:
+        st.success(message)
+    else:
+        st.error(message)
 
-    # Check if there's an existing record for the user today
-    today_record = attendance_data[(attendance_data["Username"] == username) & (attendance_data["Date"] == str(today))]
 
-    if action == "Check-In":
-        if not today_record.empty:
-            st.error("You have already checked in today!")
-        else:
-            new_entry = pd.DataFrame({
-                "Username": [username],
-                "Date": [str(today)],
-                "Check-In Time": [current_time],
-                "Check-Out Time": [""],
-                "Status": ["Checked In"]
-            })
-            attendance_data = pd.concat([attendance_data, new_entry], ignore_index=True)
-            attendance_data.to_csv(attendance_file, index=False)
-            st.success("Successfully checked in!")
-
-    elif action == "Check-Out":
-        if today_record.empty:
-            st.error("You haven't checked in today!")
-        elif not today_record["Check-Out Time"].iloc[0] == "":
-            st.error("You have already checked out today!")
-        else:
-            attendance_data.loc[(attendance_data["Username"] == username) & (
-                        attendance_data["Date"] == str(today)), "Check-Out Time"] = current_time
-            attendance_data.loc[(attendance_data["Username"] == username) & (
-                        attendance_data["Date"] == str(today)), "Status"] = "Checked Out"
-            attendance_data.to_csv(attendance_file, index=False)
-            st.success("Successfully checked out!")
+def export_download(frame, name):
+    import crm_export
+    # The export is only built when asked for and kept in the session until it is downloaded, so reruns don't
+    # regenerate it. It is tied to a hash of the rows, so an edit or another filter never serves an old file; the
+    # hash is only computed while there is an export to check.
+    col1, col2 = st.columns(2)
+    fmt = col1.selectbox("Export Format", crm_export.FORMATS, key=f"{name}_export_format")
+    compress = col2.checkbox("Gzip Compressed", key=f"{name}_export_gzip")
+
+    def signature():
+        return fmt, compress, len(frame), int(pd.util.hash_pandas_object(frame).sum())
+
+    if st.button("Prepare Export", key=f"{name}_export_prepare"):
+        st.session_state[f"{name}_export"] = (signature(), b"".join(crm_export.export_chunks(frame, fmt, compress)))
+    elif f"{name}_export" in st.session_state and st.session_state[f"{name}_export"][0] != signature():
+        del st.session_state[f"{name}_export"]
+    export = st.session_state.get(f"{name}_export")
+    if export:
+        st.download_button(
+            label=f"Download {name.capitalize()} Data as {fmt.upper()}",
+            data=export[1],
+            file_name=crm_export.export_filename(name, fmt, compress),
+            mime=crm_export.export_mime_type(fmt, compress),
+            on_click=lambda: st.session_state.pop(f"{name}_export", None),
+        )
+
+
+def export_data_page():
+    import crm_export
+    st.title("Export Data")
+    if st.session_state.role != "admin":
+        st.error("You do not have permission to access this section.")
+        return
+    name = st.selectbox("Table", crm_export.EXPORT_TABLES)
+    frame = crm_export.table(name)
+    st.write(f"{len(frame)} rows")
+    export_download(frame, name)
 
 
 def view_attendance():
@@ -232,25 +179,14 @@ def view_attendance():
     username = st.text_input("Filter by Username (optional)")
     start_date = st.date_input("Start Date (optional)", value=None)
     end_date = st.date_input("End Date (optional)", value=None)
+    include_archive = st.checkbox(f"Include archived history (older than {service.RETENTION_DAYS} days)")
 
-    filtered_attendance = attendance_data
-    if username:
-        filtered_attendance = filtered_attendance[filtered_attendance["Username"] == username]
-    if start_date:
-        filtered_attendance = filtered_attendance[filtered_attendance["Date"] >= str(start_date)]
-    if end_date:
-        filtered_attendance = filtered_attendance[filtered_attendance["Date"] <= str(end_date)]
+    filtered_attendance = service.filter_attendance(username=username, start_date=start_date, end_date=end_date,
+                                                    include_archive=include_archive)
 
     if not filtered_attendance.empty:
         st.dataframe(filtered_attendance)
-        # Download button
-        csv = filtered_attendance.to_csv(index=False)
-        st.download_button(
-            label="Download Attendance Data as CSV",
-            data=csv,
-            file_name="attendance_export.csv",
-            mime="text/csv",
-        )
+        export_download(filtered_attendance, "attendance")
     else:
         st.info("No attendance records found for the selected filters.")
 
@@ -293,9 +229,7 @@ def employee_details_page():
             search_term = st.text_input("Search Employee:")
             if st.button("Search"):
                 if search_term:
-                    filtered_data = edited_df[
-                        edited_df.apply(lambda row: row.astype(str).str.contains(search_term, case=False).any(),
-                                        axis=1)]
+                    filtered_data = crm_documents.search_rows(edited_df, search_term)
                     if not filtered_data.empty:
                         st.dataframe(filtered_data)
                     else:
@@ -322,12 +256,8 @@ def employee_background_page():
     if resumes:
         selected_resume = st.selectbox("Select a resume to view", resumes)
         if st.button(f"View {selected_resume}"):
-            with open(os.path.join(resume_directory, selected_resume), "rb") as f:
-                pdf_reader = PdfReader(f)
-                pdf_text = ""
-                for page in pdf_reader.pages:
-                    pdf_text += page.extract_text() + "\n"
-                st.text_area("Resume Content", pdf_text, height=300)
+            pdf_text = crm_documents.extract_pdf_text(os.path.join(resume_directory, selected_resume))
+            st.text_area("Resume Content", pdf_text, height=300)
         if st.button(f"Delete {selected_resume}"):
             os.remove(os.path.join(resume_directory, selected_resume))
             st.success(f"{selected_resume} deleted successfully!")
@@ -335,6 +265,69 @@ def employee_background_page():
         st.write("No resumes uploaded yet.")
 
 
+def import_data_page():
+    import crm_import
+    st.title("Import Data")
+    if st.session_state.role != "admin":
+        st.error("You do not have permission to access this section.")
+        return
+    table = st.selectbox("Import Into", ["Tasks", "Attendance"])
+    uploaded_file = st.file_uploader("Upload CSV or Excel File", type=["csv", "xlsx"])
+    if uploaded_file and st.button("Import"):
+        import_file = crm_import.import_tasks if table == "Tasks" else crm_import.import_attendance
+        try:
+            summary = import_file(uploaded_file, uploaded_file.name)
+        except ValueError as e:
+            st.error(f"Import failed: {e}")
+            return
+        st.success(f"Imported {summary['imported']} rows, rejected {summary['rejected']}.")
+        if summary["rejected"]:
+            st.dataframe(summary["rejected_rows"])
+
+
+def startup_report_page():
+    st.title("Startup Report")
+    last_render = st.session_state.get("last_render")
+    if last_render:
+        st.write(f"**Previous render:** {last_render[0]} page in {last_render[1] * 1000:.1f} ms")
+    st.subheader("Tables")
+    if service.store is None:
+        st.info(f"Tables are held by the state server at {crm_state.socket_path()}; this process loads none.")
+    else:
+        st.dataframe(pd.DataFrame([
+            {"Table": name, "Loaded": service.store.loaded(name),
+             "Rows": len(service.store.frame(name)) if service.store.loaded(name) else None,
+             "Load Time (ms)": service.store.load_times[name] * 1000 if name in service.store.load_times else None}
+            for name in crm_data.TABLES]))
+    st.subheader("Lazily Imported Modules")
+    st.dataframe(pd.DataFrame([{"Module": module, "Imported": module in sys.modules} for module in LAZY_MODULES]))
+
+
+def performance_page():
+    st.title("Performance")
+    if not crm_metrics.enabled:
+        st.info("Instrumentation is disabled (CRM_METRICS=0).")
+        return
+    st.caption("Timings and counters since this server process started or was last reset.")
+    spans = crm_metrics.spans()
+    if spans:
+        st.subheader("Spans")
+        st.dataframe(pd.DataFrame([
+            {"Span": name, "Count": s["count"], "Total (ms)": s["total_s"] * 1000, "Mean (ms)": s["mean_s"] * 1000,
+             "Max (ms)": s["max_s"] * 1000}
+            for name, s in spans.items()]).sort_values("Total (ms)", ascending=False))
+    counters = crm_metrics.counters()
+    if counters:
+        st.subheader("Counters")
+        st.dataframe(pd.DataFrame([
+            {"Metric": c["metric"], "Table": c["labels"].get("table", ""), "Value": c["value"]} for c in counters]))
+    with st.expander("Prometheus Text"):
+        st.code(crm_metrics.prometheus_text())
+    if st.button("Reset Metrics"):
+        crm_metrics.reset()
+        st.success("Metrics reset!")
+
+
 def login_page():
     st.title("HRMS Login or Register")  # Updated title
     col1, col2 = st.columns(2)
@@ -342,12 +335,12 @@ def login_page():
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         if st.button("Login"):
-            role = login(username, password)
+            role = service.login(username, password)
             if role:
                 st.session_state.current_user = username
                 st.session_state.role = role
                 st.session_state.page = "tasks"
-                record_action(username, "Login")
+                service.record_action(username, "Login")
                 st.success(f"Welcome, {username}!")
             else:
                 st.error("Invalid credentials!")
@@ -356,104 +349,102 @@ def login_page():
         new_pass = st.text_input("New Password", type="password")
         role = st.selectbox("Role", ["admin", "employee"])
         if st.button("Register"):
-            if new_user in users:
-                st.error("Username already exists!")
-            elif not new_user.strip() or not new_pass.strip():
-                st.error("Username and password cannot be empty!")
+            ok, message = service.register_user(new_user, new_pass, role)
+            if ok:
+                st.success(message)
             else:
-                users[new_user] = {"password": new_pass, "role": role}
-                pd.DataFrame.from_dict(users, orient="index").reset_index().rename(
-                    columns={"index": "Username"}).to_csv(users_file, index=False)
-                st.success(f"Account created for {new_user} as {role}.")
+                st.error(message)
 
 
 def task_page():
-    global tasks_data
     st.sidebar.title("Menu")
     menu = ["View Tasks", "Add Task", "Update Task", "Delete Task Data", "Login Details", "Daily Logs", "Delete User",
             "View Passwords", "Employee Details", "Employee Background", "Apply for Leave", "Manage Leave Applications",
-            "Leave Status", "Mark Attendance", "View Attendance", "Logout"]
+            "Leave Status", "Team Availability", "Mark Attendance", "View Attendance", "Import Data", "Export Data",
+            "Startup Report", "Performance", "Logout"]
     choice = st.sidebar.selectbox("Options", menu)
+    page_started = time.perf_counter()
     st.header(f"Welcome, {st.session_state.current_user} ({st.session_state.role.capitalize()})")
     if choice == "View Tasks":
         if st.button("Refresh Tasks"):
             st.session_state.refresh = not st.session_state.refresh
         if st.session_state.refresh:
             st.success("Task view refreshed!")
-        st.dataframe(tasks_data)
+        st.dataframe(service.table("tasks"))
         search_name = st.text_input("Search Tasks by Employee Name")
         if st.button("Search"):
-            filtered_tasks = tasks_data[tasks_data["Employee Name"].str.contains(search_name, case=False, na=False)]
+            filtered_tasks = service.search_tasks(search_name)
             if filtered_tasks.empty:
                 st.info("No tasks found for the entered name.")
             else:
                 st.dataframe(filtered_tasks)
     if choice == "Add Task" and st.session_state.role == "admin":
         task = st.text_input("Task")
-        priority = st.selectbox("Priority", ["High", "Medium", "Low"])
-        employee_names = [u for u, d in users.items() if d["role"] == "employee"]
-        employee_name = st.selectbox("Employee Name", employee_names)
-        role = st.selectbox("Role", ["Manager", "Staff", "Intern"])
-        status = st.selectbox("Status", ["Done", "Delayed", "To be Done", "On Track", "Not Done"])
+        priority = st.selectbox("Priority", service.PRIORITIES)
+        employee_name = st.selectbox("Employee Name", service.employee_names())
+        role = st.selectbox("Role", service.EMPLOYEE_ROLES)
+        status = st.selectbox("Status", service.TASK_STATUSES)
         start_date = st.date_input("Start Date")
         end_date = st.date_input("End Date")
         if st.button("Add Task"):
-            if not task.strip():
-                st.error("Task name cannot be empty!")
+            ok, message = service.add_task(task, priority, employee_name, role, status, start_date, end_date)
+            if ok:
+                st.success(message)
             else:
-                tasks_data = pd.concat(
-                    [tasks_data, pd.DataFrame([[task, priority, employee_name, role, status, start_date, end_date]],
-                                              columns=["Task", "Priority", "Employee Name", "Employee Role", "Status",
-                                                       "Start Date", "End Date"])])
-                tasks_data.to_csv(tasks_file, index=False)
-                st.success("Task added!")
+                st.error(message)
     if choice == "Update Task" and st.session_state.role == "employee":
         employee_name = st.session_state.current_user
-        employee_tasks = tasks_data[tasks_data["Employee Name"] == employee_name]
+        employee_tasks = service.employee_tasks(employee_name)
         if not employee_tasks.empty:
             task_index = st.selectbox("Select Task to Update", employee_tasks.index)
-            status = st.selectbox("Update Status", ["Done", "Delayed", "To Be Done", "On Track", "Not Done"])
+            status = st.selectbox("Update Status", service.TASK_STATUSES)
             if st.button("Update Task"):
-                tasks_data.at[task_index, "Status"] = status
-                tasks_data.to_csv(tasks_file, index=False)
+                service.update_task_status(task_index, status)
                 st.success("Task updated!")
         else:
             st.info("You have no tasks assigned.")
     if choice == "Delete Task Data" and st.session_state.role == "admin":
         if st.button("Delete All Tasks"):
-            delete_task_data(delete_all=True)
+            service.delete_task_data(delete_all=True)
             st.success("All tasks deleted!")
-        if not tasks_data.empty:
-            task_index = st.number_input("Task Index to Delete", min_value=0, max_value=len(tasks_data) - 1, step=1)
+        tasks = service.table("tasks")
+        if not tasks.empty:
+            task_index = st.number_input("Task Index to Delete", min_value=0, max_value=len(tasks) - 1, step=1)
             if st.button("Delete Task"):
-                delete_task_data(index=task_index)
+                service.delete_task_data(index=task_index)
                 st.success(f"Task {task_index} deleted!")
     if choice == "Login Details" and st.session_state.role == "admin":
         username = st.text_input("Username")
         start_date = st.date_input("Start Date", value=None)
         end_date = st.date_input("End Date", value=None)
+        include_archive = st.checkbox(f"Include archived history (older than {service.RETENTION_DAYS} days)")
         if st.button("Search Logs"):
-            filtered_logs = filter_login_details(username=username, start_date=start_date, end_date=end_date)
+            filtered_logs = service.filter_login_details(username=username, start_date=start_date, end_date=end_date,
+                                                         include_archive=include_archive)
             st.dataframe(filtered_logs)
     if choice == "Daily Logs" and st.session_state.role == "admin":
         st.subheader("Daily Login/Logout Details")
-        today_logs = daily_logs()
+        today_logs = service.daily_logs()
         if today_logs.empty:
             st.info("No login/logout details for today.")
         else:
             st.dataframe(today_logs)
+        if st.button("Archive Old Login/Logout Details"):
+            archived = service.compact_history()
+            st.success(f"Archived {archived['logs']} log and {archived['attendance']} attendance rows older than "
+                       f"{service.RETENTION_DAYS} days.")
         if st.button("Delete All Login/Logout Details"):
-            delete_all_login_logout_details()
-            st.success("All login/logout details have been deleted!")
+            service.delete_all_login_logout_details()
+            st.success("All current login/logout details have been deleted! Archived history is kept.")
     if choice == "Delete User" and st.session_state.role == "admin":
         del_user = st.text_input("Enter Username to Delete")
         if st.button("Delete User"):
-            if delete_user(del_user):
+            if service.delete_user(del_user):
                 st.success(f"User '{del_user}' has been deleted!")
             else:
                 st.error(f"User '{del_user}' not found!")
     if choice == "View Passwords" and st.session_state.role == "admin":
-        passwords = pd.DataFrame(users).transpose().reset_index().rename(columns={"index": "Username"})
+        passwords = service.table("users")
         st.dataframe(passwords)
     if choice == "Employee Details":
         employee_details_page()
@@ -461,12 +452,19 @@ def task_page():
         employee_background_page()
     if choice == "Apply for Leave" and st.session_state.role == "employee":
         st.subheader("Leave Application Form")
-        leave_type = st.selectbox("Leave Type", ["Sick Leave", "Casual Leave", "Annual Leave"])
+        leave_type = st.selectbox("Leave Type", service.LEAVE_TYPES)
         start_date = st.date_input("Start Date")
         end_date = st.date_input("End Date")
         if st.button("Apply for Leave"):
-            apply_for_leave(st.session_state.current_user, leave_type, start_date, end_date)
-            st.success("Leave application submitted!")
+            if end_date < start_date:
+                st.error("End date cannot be before the start date!")
+            else:
+                ok, message = service.apply_for_leave(st.session_state.current_user, leave_type, start_date,
+                                                      end_date)
+                if ok:
+                    st.success(message)
+                else:
+                    st.error(message)
     if choice == "Manage Leave Applications" and st.session_state.role == "admin":
         manage_leave_applications()
     if choice == "Leave Status":
@@ -476,32 +474,43 @@ def task_page():
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Check-In"):
-                record_attendance(st.session_state.current_user, "Check-In")
+                mark_attendance("Check-In")
         with col2:
             if st.button("Check-Out"):
-                record_attendance(st.session_state.current_user, "Check-Out")
+                mark_attendance("Check-Out")
         # Show today's attendance status
-        today = datetime.now(pytz.timezone('Asia/Kolkata')).date()
-        today_record = attendance_data[
-            (attendance_data["Username"] == st.session_state.current_user) & (attendance_data["Date"] == str(today))]
+        today_record = service.today_attendance(st.session_state.current_user)
         if not today_record.empty:
             st.write(f"**Today's Status:** {today_record['Status'].iloc[0]}")
             st.write(f"**Check-In Time:** {today_record['Check-In Time'].iloc[0]}")
-            if today_record['Check outta Time'].iloc[0]:
+            if not pd.isna(today_record['Check-Out Time'].iloc[0]) and today_record['Check-Out Time'].iloc[0]:
                 st.write(f"**Check-Out Time:** {today_record['Check-Out Time'].iloc[0]}")
     if choice == "View Attendance":
         view_attendance()
+    if choice == "Import Data":
+        import_data_page()
+    if choice == "Export Data":
+        export_data_page()
+    if choice == "Team Availability":
+        team_availability_page()
+    if choice == "Startup Report" and st.session_state.role == "admin":
+        startup_report_page()
+    if choice == "Performance" and st.session_state.role == "admin":
+        performance_page()
     if choice == "Logout":
-        record_action(st.session_state.current_user, "Logout")
+        service.record_action(st.session_state.current_user, "Logout")
         st.session_state.current_user = None
         st.session_state.role = None
         st.session_state.page = "login"
         st.success("Logged out!")
+    crm_metrics.observe(f"page {choice}", time.perf_counter() - page_started)
 
 
 # Main Logic
 if st.session_state.page == "login":
-    login_page()
+    with crm_metrics.span("page Login"):
+        login_page()
 elif st.session_state.page == "tasks":
     task_page()
+st.session_state.last_render = (st.session_state.page, time.perf_counter() - render_started)
 
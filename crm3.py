@@ -1,34 +1,18 @@
 import streamlit as st
 import pandas as pd
-import datetime
-
-# Persistent storage (CSV files)
-users_file = "users.csv"
-tasks_file = "tasks.csv"
-login_logout_file = "login_logout.csv"
-
-# Initialize files if they don't exist or have incorrect columns
-try:
-    users = pd.read_csv(users_file)
-    if "Username" not in users.columns:
-        raise ValueError("Missing required columns in users.csv")
-    users = users.set_index("Username").to_dict("index")
-except (FileNotFoundError, ValueError):
-    # Recreate users file with default admin entry
-    users = {"admin": {"password": "admin123", "role": "admin"}}
-    pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
-
-try:
-    tasks_data = pd.read_csv(tasks_file)
-except FileNotFoundError:
-    tasks_data = pd.DataFrame(columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
-    tasks_data.to_csv(tasks_file, index=False)
-
-try:
-    login_logout_data = pd.read_csv(login_logout_file)
-except FileNotFoundError:
-    login_logout_data = pd.DataFrame(columns=["Username", "Action", "Timestamp"])
-    login_logout_data.to_csv(login_logout_file, index=False)
+
+import crm_data
+import crm_state
+
+# This app reads and writes the CSV files itself, which would race the state server's copy of the data
+if crm_state.socket_path():
+    st.error("crm3.py does not support the shared state server (CRM_STATE_SOCKET is set). "
+             "Run JobGenix CRM.py instead.")
+    st.stop()
+
+# Persistent storage (CSV files), shared with JobGenix CRM.py and crm7.py
+store = crm_data.get_store()
+users = store.users
 
 # Login Function
 def login(username, password):
@@ -41,11 +25,7 @@ def login(username, password):
 
 # Record login/logout
 def record_time(username, action):
-    global login_logout_data
-    now = datetime.datetime.now()
-    new_entry = pd.DataFrame({"Username": [username], "Action": [action], "Timestamp": [now]})
-    login_logout_data = pd.concat([login_logout_data, new_entry])
-    login_logout_data.to_csv(login_logout_file, index=False)
+    store.append("logs", [[username, action, crm_data.timestamp()]])
 
 # Login Page
 def login_page():
@@ -85,12 +65,11 @@ def login_page():
             else:
                 # Add the new user to the users dictionary
                 users[new_username] = {"password": new_password, "role": role}
-                pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
+                store.save("users")
                 st.success(f"Account created for {new_username} as {role}")
 
 # Task Assigning Tree Page
 def task_page():
-    global tasks_data, login_logout_data
     st.sidebar.title("Menu")
     menu = ["View Task Tree", "Update Tasks", "Add New Task", "Delete Employee", "Password Records", "Login Details", "Logout"]
     choice = st.sidebar.selectbox("Navigation", menu)
@@ -99,19 +78,19 @@ def task_page():
     st.subheader(f"Welcome, {st.session_state.current_user} ({st.session_state.role.capitalize()})")
 
     if choice == "View Task Tree":
-        st.dataframe(tasks_data)
+        st.dataframe(store.tasks)
 
     elif choice == "Update Tasks" and st.session_state.role == "employee":
         st.subheader("Update Task Status (For Employees)")
-        task_index = st.number_input("Task Index (Row Number)", min_value=0, max_value=len(tasks_data) - 1, step=1)
+        task_index = st.number_input("Task Index (Row Number)", min_value=0, max_value=len(store.tasks) - 1, step=1)
         new_status = st.selectbox("Update Status", ["Done", "Delayed", "At risk", "On Track", "Not Done", "Just Notified"])
         start_date = st.date_input("Update Start Date")
         end_date = st.date_input("Update End Date")
         if st.button("Update Task"):
-            tasks_data.loc[task_index, "Status"] = new_status
-            tasks_data.loc[task_index, "Start Date"] = start_date
-            tasks_data.loc[task_index, "End Date"] = end_date
-            tasks_data.to_csv(tasks_file, index=False)
+            store.tasks.loc[task_index, "Status"] = new_status
+            store.tasks.loc[task_index, "Start Date"] = str(start_date)
+            store.tasks.loc[task_index, "End Date"] = str(end_date)
+            store.save("tasks")
             st.success("Task updated successfully!")
 
     elif choice == "Add New Task" and st.session_state.role == "admin":
@@ -124,10 +103,7 @@ def task_page():
         start_date = st.date_input("Start Date")
         end_date = st.date_input("End Date")
         if st.button("Add Task"):
-            new_task = pd.DataFrame([[task, priority, employee_name, employee_role, status, start_date, end_date]],
-                                    columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
-            tasks_data = pd.concat([tasks_data, new_task])
-            tasks_data.to_csv(tasks_file, index=False)
+            store.append("tasks", [[task, priority, employee_name, employee_role, status, start_date, end_date]])
             st.success("Task added successfully!")
 
     elif choice == "Delete Employee" and st.session_state.role == "admin":
@@ -136,7 +112,7 @@ def task_page():
         if st.button("Delete Employee"):
             if delete_username in users:
                 del users[delete_username]
-                pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
+                store.save("users")
                 st.success(f"Employee {delete_username} has been deleted.")
             else:
                 st.error("Employee not found!")
@@ -148,8 +124,8 @@ def task_page():
 
     elif choice == "Login Details" and st.session_state.role == "admin":
         st.subheader("Login Details (Admin Only)")
-        if not login_logout_data.empty:
-            st.dataframe(login_logout_data)
+        if not store.logs.empty:
+            st.dataframe(store.logs)
         else:
             st.write("No login/logout records available.")
 
@@ -1,28 +1,18 @@
 import streamlit as st
 import pandas as pd
-import datetime
-
-# File paths
-users_file, tasks_file, log_file = "users.csv", "tasks.csv", "login_logout.csv"
-
-# Initialize files and data
-try:
-    users = pd.read_csv(users_file).set_index("Username").to_dict("index")
-except:
-    users = {"admin": {"password": "admin123", "role": "admin"}}
-    pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
-
-try:
-    tasks_data = pd.read_csv(tasks_file)
-except:
-    tasks_data = pd.DataFrame(columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
-    tasks_data.to_csv(tasks_file, index=False)
-
-try:
-    log_data = pd.read_csv(log_file)
-except:
-    log_data = pd.DataFrame(columns=["Username", "Action", "Timestamp"])
-    log_data.to_csv(log_file, index=False)
+
+import crm_data
+import crm_state
+
+# This app reads and writes the CSV files itself, which would race the state server's copy of the data
+if crm_state.socket_path():
+    st.error("crm7.py does not support the shared state server (CRM_STATE_SOCKET is set). "
+             "Run JobGenix CRM.py instead.")
+    st.stop()
+
+# Shared data store (users.csv, tasks.csv, login_logout.csv)
+store = crm_data.get_store()
+users = store.users
 
 # Session state variables
 if "current_user" not in st.session_state: st.session_state.current_user = None
@@ -35,28 +25,24 @@ def login(username, password):
     return users[username]["role"] if username in users and users[username]["password"] == password else None
 
 def record_action(username, action):
-    global log_data
-    new_entry = pd.DataFrame({"Username": [username], "Action": [action], "Timestamp": [datetime.datetime.now()]})
-    log_data = pd.concat([log_data, new_entry])
-    log_data.to_csv(log_file, index=False)
+    store.append("logs", [[username, action, crm_data.timestamp()]])
 
 def delete_task_data(delete_all=False, index=None):
-    global tasks_data
     if delete_all:
-        tasks_data = pd.DataFrame(columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])
+        store.clear("tasks")
     elif index is not None:
-        tasks_data = tasks_data.drop(index=index).reset_index(drop=True)
-    tasks_data.to_csv(tasks_file, index=False)
+        store.tasks = store.tasks.drop(index=index).reset_index(drop=True)
+        store.save("tasks")
 
 def delete_user(username):
     if username in users:
         del users[username]
-        pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
+        store.save("users")
         return True
     return False
 
 def filter_login_details(username=None, start_date=None, end_date=None):
-    filtered_data = log_data
+    filtered_data = store.logs
     if username:
         filtered_data = filtered_data[filtered_data["Username"] == username]
     if start_date:
@@ -66,8 +52,8 @@ def filter_login_details(username=None, start_date=None, end_date=None):
     return filtered_data
 
 def daily_logs():
-    today = datetime.datetime.now().date()
-    today_logs = log_data[log_data["Timestamp"].str.startswith(str(today))]
+    today = crm_data.now().date()
+    today_logs = store.logs[store.logs["Timestamp"].str.startswith(str(today))]
     return today_logs
 
 # Pages
@@ -98,11 +84,10 @@ def login_page():
                 st.error("Username and password cannot be empty!")
             else:
                 users[new_user] = {"password": new_pass, "role": role}
-                pd.DataFrame.from_dict(users, orient="index").reset_index().rename(columns={"index": "Username"}).to_csv(users_file, index=False)
+                store.save("users")
                 st.success(f"Account created for {new_user} as {role}.")
 
 def task_page():
-    global tasks_data
     st.sidebar.title("Menu")
     menu = ["View Tasks", "Add Task", "Update Task", "Delete Task Data", "Login Details", "Daily Logs", "Delete User", "View Passwords", "Logout"]
     choice = st.sidebar.selectbox("Options", menu)
@@ -116,12 +101,12 @@ def task_page():
             st.success("Task view refreshed!")
 
         # Show all tasks
-        st.dataframe(tasks_data)
+        st.dataframe(store.tasks)
 
         # Search tasks by employee name
         search_name = st.text_input("Search Tasks by Employee Name")
         if st.button("Search"):
-            filtered_tasks = tasks_data[tasks_data["Employee Name"].str.contains(search_name, case=False, na=False)]
+            filtered_tasks = store.tasks[store.tasks["Employee Name"].str.contains(search_name, case=False, na=False)]
             if filtered_tasks.empty:
                 st.info("No tasks found for the entered name.")
             else:
@@ -139,25 +124,23 @@ def task_page():
             if not task.strip():
                 st.error("Task name cannot be empty!")
             else:
-                tasks_data = pd.concat([tasks_data, pd.DataFrame([[task, priority, employee_name, role, status, start_date, end_date]],
-                                        columns=["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"])])
-                tasks_data.to_csv(tasks_file, index=False)
+                store.append("tasks", [[task, priority, employee_name, role, status, start_date, end_date]])
                 st.success("Task added!")
 
     if choice == "Update Task" and st.session_state.role == "employee":
-        task_index = st.number_input("Task Index", min_value=0, max_value=len(tasks_data) - 1, step=1)
+        task_index = st.number_input("Task Index", min_value=0, max_value=len(store.tasks) - 1, step=1)
         status = st.selectbox("Update Status", ["Done", "Delayed", "To Be Done", "On Track", "Not Done"])
         if st.button("Update Task"):
-            tasks_data.at[task_index, "Status"] = status
-            tasks_data.to_csv(tasks_file, index=False)
+            store.tasks.at[task_index, "Status"] = status
+            store.save("tasks")
             st.success("Task updated!")
 
     if choice == "Delete Task Data" and st.session_state.role == "admin":
         if st.button("Delete All Tasks"):
             delete_task_data(delete_all=True)
             st.success("All tasks deleted!")
-        if not tasks_data.empty:
-            task_index = st.number_input("Task Index to Delete", min_value=0, max_value=len(tasks_data) - 1, step=1)
+        if not store.tasks.empty:
+            task_index = st.number_input("Task Index to Delete", min_value=0, max_value=len(store.tasks) - 1, step=1)
             if st.button("Delete Task"):
                 delete_task_data(index=task_index)
                 st.success(f"Task {task_index} deleted!")
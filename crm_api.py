@@ -0,0 +1,299 @@
+import asyncio
+import os
+import tempfile
+from aiohttp import web
+
+import crm_export
+import crm_import
+import crm_metrics
+import crm_service as service
+import crm_state
+
+# Optional shared secret; when set, every request must send it as "X-API-Token"
+api_token = os.environ.get("CRM_API_TOKEN")
+
+
+def json_frame(frame):
+    return web.Response(text=frame.to_json(orient="records", date_format="iso"), content_type="application/json")
+
+
+def json_result(ok, message, status=400):
+    return web.json_response({"ok": ok, "message": message}, status=200 if ok else status)
+
+
+@web.middleware
+async def token_middleware(request, handler):
+    if api_token and request.headers.get("X-API-Token") != api_token:
+        return json_result(False, "Invalid API token.", status=401)
+    return await handler(request)
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    # Named by route pattern, e.g. "api PATCH /tasks/{index}", so ids don't create a span per row
+    resource = request.match_info.route.resource
+    with crm_metrics.span(f"api {request.method} {resource.canonical if resource else request.path}"):
+        return await handler(request)
+
+
+@web.middleware
+async def bad_request_middleware(request, handler):
+    try:
+        return await handler(request)
+    except (KeyError, ValueError, TypeError) as e:
+        return json_result(False, f"Bad request: {e}")
+
+
+# Users
+async def login(request):
+    body = await request.json()
+    role = service.login(body["username"], body["password"])
+    if role is None:
+        return json_result(False, "Invalid credentials!", status=401)
+    service.record_action(body["username"], "Login")
+    return web.json_response({"ok": True, "username": body["username"], "role": role})
+
+
+async def logout(request):
+    body = await request.json()
+    service.record_action(body["username"], "Logout")
+    return json_result(True, "Logged out!")
+
+
+# Tasks
+async def list_tasks(request):
+    employee = request.query.get("employee")
+    return json_frame(service.search_tasks(employee) if employee else service.table("tasks"))
+
+
+def _task_row(body):
+    return [body["task"], body.get("priority", "Medium"), body["employee_name"], body.get("employee_role", "Staff"),
+            body.get("status", "To be Done"), body.get("start_date", ""), body.get("end_date", "")]
+
+
+async def add_task(request):
+    body = await request.json()
+    ok, message = service.add_task(*_task_row(body))
+    return json_result(ok, message)
+
+
+async def add_tasks_bulk(request):
+    body = await request.json()
+    added, rejected = service.add_tasks([_task_row(task) for task in body["tasks"]])
+    return web.json_response({
+        "ok": rejected.empty,
+        "added": added,
+        "rejected": [{"index": int(row), "reason": reason} for row, reason in zip(rejected["Row"], rejected["Reason"])],
+    })
+
+
+async def update_task(request):
+    body = await request.json()
+    if not service.update_task_status(int(request.match_info["index"]), body["status"]):
+        return json_result(False, "Task not found!", status=404)
+    return json_result(True, "Task updated!")
+
+
+# Attendance
+async def record_attendance(request):
+    body = await request.json()
+    ok, message = service.record_attendance_bulk([body])[0]
+    # Unknown users and actions are bad input; the rest conflict with what is already recorded for the day
+    return json_result(ok, message, status=400 if message.startswith("Unknown") else 409)
+
+
+async def record_attendance_bulk(request):
+    body = await request.json()
+    results = service.record_attendance_bulk(body["entries"])
+    return web.json_response({
+        "ok": all(ok for ok, _ in results),
+        "accepted": sum(ok for ok, _ in results),
+        "results": [{"ok": ok, "message": message} for ok, message in results],
+    })
+
+
+def _include_archive(query):
+    return query.get("archive", "0") in ("1", "true", "yes")
+
+
+async def list_attendance(request):
+    query = request.query
+    return json_frame(service.filter_attendance(query.get("username"), query.get("start_date"),
+                                                query.get("end_date"), _include_archive(query)))
+
+
+# Leave
+async def apply_for_leave(request):
+    body = await request.json()
+    # An invalid range raises ValueError (400 from the middleware); overlapping an existing application is a 409
+    ok, message = service.apply_for_leave(body["employee_name"], body["leave_type"], body["start_date"],
+                                          body["end_date"])
+    return json_result(ok, message, status=409)
+
+
+async def list_leave(request):
+    employee = request.query.get("employee")
+    return json_frame(service.employee_leaves(employee) if employee else service.table("leave"))
+
+
+async def update_leave(request):
+    body = await request.json()
+    if body["status"] not in ("Accepted", "Rejected"):
+        return json_result(False, "Status must be 'Accepted' or 'Rejected'.")
+    if service.update_leave_status(int(request.match_info["index"]), body["status"]) is None:
+        return json_result(False, "Leave application not found!", status=404)
+    return json_result(True, f"Leave application {body['status'].lower()}!")
+
+
+async def availability(request):
+    # ?start_date=...&end_date=...&employees=a,b&absences=1; end_date defaults to start_date
+    query = request.query
+    employees = query["employees"].split(",") if query.get("employees") else None
+    include_absences = query.get("absences", "0") in ("1", "true", "yes")
+    result = service.team_availability(query["start_date"], query.get("end_date"), employees, include_absences)
+    result["on_leave"] = service.on_leave(query["start_date"], query.get("end_date"), employees).to_dict("records")
+    if include_absences:
+        result["absences"] = service.absences(query["start_date"], query.get("end_date"), employees).to_dict("records")
+    return web.json_response(result)
+
+
+# Bulk import
+async def _receive_upload(request, target):
+    # Streams a multipart "file" field or a raw request body (named by ?filename=) to disk
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        field = await reader.next()
+        while field is not None and field.name != "file":
+            field = await reader.next()
+        if field is None:
+            raise ValueError("no 'file' field in upload")
+        filename = field.filename or "upload.csv"
+        while True:
+            chunk = await field.read_chunk()
+            if not chunk:
+                break
+            target.write(chunk)
+    else:
+        filename = request.query.get("filename", "upload.csv")
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            target.write(chunk)
+    target.seek(0)
+    return filename
+
+
+async def _import(request, import_file):
+    with tempfile.TemporaryFile() as upload:
+        filename = await _receive_upload(request, upload)
+        # Parsing and validating runs in a worker thread so other requests are served meanwhile; the crm_service
+        # calls it makes take the store's lock like any other
+        summary = await asyncio.to_thread(import_file, upload, filename)
+    return web.json_response({
+        "ok": True,
+        "imported": summary["imported"],
+        "rejected": summary["rejected"],
+        "rejected_rows": [{"row": int(row), "reason": reason}
+                          for row, reason in zip(summary["rejected_rows"]["Row"], summary["rejected_rows"]["Reason"])],
+    })
+
+
+async def import_tasks(request):
+    return await _import(request, crm_import.import_tasks)
+
+
+async def import_attendance(request):
+    return await _import(request, crm_import.import_attendance)
+
+
+# Export
+def _export_frame(table, query):
+    if table == "attendance":
+        return service.filter_attendance(query.get("username"), query.get("start_date"), query.get("end_date"),
+                                         _include_archive(query))
+    if table == "logs":
+        return service.filter_login_details(query.get("username"), query.get("start_date"), query.get("end_date"),
+                                            _include_archive(query))
+    if table == "tasks" and query.get("employee"):
+        return service.search_tasks(query["employee"])
+    if table == "leave" and query.get("employee"):
+        return service.employee_leaves(query["employee"])
+    return crm_export.table(table)
+
+
+async def export_table(request):
+    table = request.match_info["table"]
+    if table not in crm_export.EXPORT_TABLES:
+        return json_result(False, f"Unknown table '{table}'.", status=404)
+    fmt = request.query.get("format", "csv")
+    compress = request.query.get("gzip", "0") in ("1", "true", "yes")
+    chunks = crm_export.export_chunks(_export_frame(table, request.query), fmt, compress)
+    response = web.StreamResponse(headers={
+        "Content-Type": crm_export.export_mime_type(fmt, compress),
+        "Content-Disposition": f'attachment; filename="{crm_export.export_filename(table, fmt, compress)}"',
+    })
+    await response.prepare(request)
+    for chunk in chunks:
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+# Instrumentation
+async def metrics(request):
+    return web.Response(body=crm_metrics.prometheus_text().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+# Login/logout log
+async def list_logs(request):
+    query = request.query
+    return json_frame(service.filter_login_details(query.get("username"), query.get("start_date"),
+                                                   query.get("end_date"), _include_archive(query)))
+
+
+async def list_daily_logs(request):
+    return json_frame(service.daily_logs())
+
+
+# Retention
+async def background_compaction(app):
+    # Archives old login logs and attendance hourly in a worker thread; with a state server configured, the server
+    # does this instead
+    task = None
+    if not crm_state.socket_path():
+        task = asyncio.create_task(crm_state.every(service.COMPACTION_INTERVAL, service.compact_history,
+                                                   immediately=True, thread=True))
+    yield
+    if task:
+        task.cancel()
+
+
+def create_app():
+    app = web.Application(middlewares=[token_middleware, metrics_middleware, bad_request_middleware])
+    app.cleanup_ctx.append(background_compaction)
+    app.add_routes([
+        web.post("/login", login),
+        web.post("/logout", logout),
+        web.get("/tasks", list_tasks),
+        web.post("/tasks", add_task),
+        web.post("/tasks/bulk", add_tasks_bulk),
+        web.patch("/tasks/{index}", update_task),
+        web.get("/attendance", list_attendance),
+        web.post("/attendance", record_attendance),
+        web.post("/attendance/bulk", record_attendance_bulk),
+        web.get("/leave", list_leave),
+        web.post("/leave", apply_for_leave),
+        web.patch("/leave/{index}", update_leave),
+        web.get("/availability", availability),
+        web.post("/import/tasks", import_tasks),
+        web.post("/import/attendance", import_attendance),
+        web.get("/export/{table}", export_table),
+        web.get("/logs", list_logs),
+        web.get("/logs/daily", list_daily_logs),
+        web.get("/metrics", metrics),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=os.environ.get("CRM_API_HOST", "127.0.0.1"),
+                port=int(os.environ.get("CRM_API_PORT", 8080)))
@@ -0,0 +1,161 @@
+import bisect
+import random
+from datetime import date, timedelta
+
+# Leave applications that block the dates they cover; rejected ones don't
+ACTIVE_LEAVE_STATUSES = ["Accepted", "Pending"]
+
+
+class _Node:
+    __slots__ = ("start", "end", "key", "priority", "max_end", "left", "right")
+
+    def __init__(self, start, end, key):
+        self.start, self.end, self.key = start, end, key
+        self.priority = random.random()
+        self.max_end = end
+        self.left = self.right = None
+
+
+def _update(node):
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+    return node
+
+
+def _split(node, position, inclusive):
+    # (nodes ordered before position, the rest); with inclusive, a node at position goes to the left part
+    if node is None:
+        return None, None
+    here = (node.start, node.key)
+    if here < position or (inclusive and here == position):
+        node.right, right = _split(node.right, position, inclusive)
+        return _update(node), right
+    left, node.left = _split(node.left, position, inclusive)
+    return left, _update(node)
+
+
+def _merge(left, right):
+    if left is None or right is None:
+        return left if right is None else right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class IntervalTree:
+    # Closed intervals [start, end] kept in a treap ordered by (start, key), each node also holding the latest end in
+    # its subtree. Inserts and removals are O(log n). A query skips every subtree that ends before the query range
+    # or starts after it, so it costs O(log n + k) for k overlaps when the stored ranges are short (leave, absences).
+    # Bounds are anything comparable; here they are YYYY-MM-DD strings. (start, key) must be unique.
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, start, end, key):
+        left, right = _split(self._root, (start, key), False)
+        self._root = _merge(_merge(left, _Node(start, end, key)), right)
+        self._size += 1
+
+    def remove(self, start, key):
+        left, rest = _split(self._root, (start, key), False)
+        found, right = _split(rest, (start, key), True)
+        self._root = _merge(left, right)
+        if found is not None:
+            self._size -= 1
+        return found is not None
+
+    def overlapping(self, start, end):
+        # [(start, end, key)] of every interval sharing at least one point with [start, end], in start order
+        found = []
+        stack, node = [], self._root
+        while stack or node is not None:
+            if node is not None and node.max_end >= start:
+                stack.append(node)
+                node = node.left
+                continue
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start > end:
+                break  # in start order, so nothing after this can overlap
+            if node.end >= start:
+                found.append((node.start, node.end, node.key))
+            node = node.right
+        return found
+
+
+class LeaveIndex:
+    # Accepted and pending leave applications by date range, keyed by their row label in the leave table.
+    # `rows` is the table length it reflects, so callers can tell when the table changed behind its back.
+
+    def __init__(self, leave):
+        self.tree = IntervalTree()
+        self._ranges = {}
+        self.rows = len(leave)
+        for label, start, end, status in zip(leave.index, leave["Start Date"], leave["End Date"], leave["Status"]):
+            self.update(label, start, end, status)
+
+    def update(self, label, start, end, status):
+        # Call after an application is added or its status changes
+        previous = self._ranges.pop(label, None)
+        if previous is not None:
+            self.tree.remove(previous, label)
+        if status in ACTIVE_LEAVE_STATUSES and start:
+            self._ranges[label] = start
+            self.tree.insert(start, max(start, end), label)
+
+    def overlapping(self, start, end):
+        return [label for _, _, label in self.tree.overlapping(start, end)]
+
+
+def _shift(day, days):
+    return str(date.fromisoformat(day) + timedelta(days=days))
+
+
+class AbsenceIndex:
+    # Attendance has no "absent" rows, so an absence is a run of days without a record between two recorded days of
+    # the same user (weekends and holidays included). One interval per gap, keyed by username.
+
+    def __init__(self, attendance):
+        self.tree = IntervalTree()
+        self._days = {}
+        self.rows = len(attendance)
+        for username, days in attendance.groupby("Username")["Date"]:
+            days = sorted(set(day for day in days if day))
+            self._days[username] = days
+            for previous, following in zip(days, days[1:]):
+                self._add_gap(username, previous, following)
+
+    def _add_gap(self, username, previous, following):
+        start, end = _shift(previous, 1), _shift(following, -1)
+        if start <= end:
+            self.tree.insert(start, end, username)
+
+    def add(self, username, day):
+        # Call for every new attendance record; a day inside an existing gap splits it in two
+        days = self._days.setdefault(username, [])
+        i = bisect.bisect_left(days, day)
+        if i < len(days) and days[i] == day:
+            return
+        previous = days[i - 1] if i > 0 else None
+        following = days[i] if i < len(days) else None
+        if previous and following:
+            self.tree.remove(_shift(previous, 1), username)
+        if previous:
+            self._add_gap(username, previous, day)
+        if following:
+            self._add_gap(username, day, following)
+        days.insert(i, day)
+
+    def overlapping(self, start, end):
+        # [(username, first absent day, last absent day)]
+        return [(username, first, last) for first, last, username in self.tree.overlapping(start, end)]
@@ -0,0 +1,287 @@
+import argparse
+import importlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import crm_data
+
+# Synthetic dataset sizes; any of them can be overridden from the command line
+PRESETS = {
+    "small": {"log_rows": 10_000, "employees": 1_000, "tasks": 5_000, "leaves": 2_000, "attendance_days": 10,
+              "workbook_rows": 1_000, "resume_pages": 5},
+    "medium": {"log_rows": 1_000_000, "employees": 10_000, "tasks": 50_000, "leaves": 20_000, "attendance_days": 30,
+               "workbook_rows": 20_000, "resume_pages": 20},
+    "large": {"log_rows": 10_000_000, "employees": 100_000, "tasks": 500_000, "leaves": 200_000,
+              "attendance_days": 30, "workbook_rows": 100_000, "resume_pages": 50},
+}
+DEPARTMENTS = ["Engineering", "Sales", "Support", "Finance", "Operations", "Marketing"]
+
+
+# Dataset generation
+def employee_names(count):
+    return np.array([f"emp{i:06d}" for i in range(count)])
+
+
+def generate_tables(data_dir, sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    names = employee_names(sizes["employees"])
+    today = pd.Timestamp(crm_data.now().date())
+    tables = {}
+
+    tables["users"] = pd.DataFrame({
+        "Username": np.concatenate([["admin"], names]),
+        "password": "secret",
+        "role": np.concatenate([["admin"], np.full(len(names), "employee")]),
+    })
+
+    # Logs span the last 90 days and include today, so daily_logs has something to find
+    seconds = np.sort(rng.integers(0, 90 * 86400, sizes["log_rows"]))[::-1]
+    tables["logs"] = pd.DataFrame({
+        "Username": rng.choice(names, sizes["log_rows"]),
+        "Action": np.where(np.arange(sizes["log_rows"]) % 2 == 0, "Login", "Logout"),
+        "Timestamp": (today + pd.Timedelta(hours=23) - pd.to_timedelta(seconds, unit="s")).strftime(
+            crm_data.TIMESTAMP_FORMAT),
+    })
+
+    start = rng.integers(0, 120, sizes["tasks"])
+    tables["tasks"] = pd.DataFrame({
+        "Task": [f"Task {i}" for i in range(sizes["tasks"])],
+        "Priority": rng.choice(["High", "Medium", "Low"], sizes["tasks"]),
+        "Employee Name": rng.choice(names, sizes["tasks"]),
+        "Employee Role": rng.choice(["Manager", "Staff", "Intern"], sizes["tasks"]),
+        "Status": rng.choice(["Done", "Delayed", "To be Done", "On Track", "Not Done"], sizes["tasks"]),
+        "Start Date": (today - pd.to_timedelta(start, unit="D")).strftime(crm_data.DATE_FORMAT),
+        "End Date": (today - pd.to_timedelta(start - 14, unit="D")).strftime(crm_data.DATE_FORMAT),
+    })
+
+    start = rng.integers(-30, 365, sizes["leaves"])
+    tables["leave"] = pd.DataFrame({
+        "Employee Name": rng.choice(names, sizes["leaves"]),
+        "Leave Type": rng.choice(["Sick Leave", "Casual Leave", "Annual Leave"], sizes["leaves"]),
+        "Start Date": (today - pd.to_timedelta(start, unit="D")).strftime(crm_data.DATE_FORMAT),
+        "End Date": (today - pd.to_timedelta(start - rng.integers(0, 10, sizes["leaves"]), unit="D")).strftime(
+            crm_data.DATE_FORMAT),
+        "Status": rng.choice(["Pending", "Accepted", "Rejected"], sizes["leaves"]),
+    })
+
+    # One completed record per employee per past day; today is left free for the check-in benchmarks
+    days = pd.date_range(end=today - timedelta(days=1), periods=sizes["attendance_days"])
+    tables["attendance"] = pd.DataFrame({
+        "Username": np.tile(names, len(days)),
+        "Date": np.repeat(days.strftime(crm_data.DATE_FORMAT), len(names)),
+        "Check-In Time": "09:00:00",
+        "Check-Out Time": "18:00:00",
+        "Status": "Checked Out",
+    })
+
+    for name, frame in tables.items():
+        frame.to_csv(os.path.join(data_dir, crm_data.TABLES[name].file), index=False)
+    with open(os.path.join(data_dir, crm_data.schema.VERSION_FILE), "w") as f:
+        f.write(str(crm_data.SCHEMA_VERSION))
+    return names
+
+
+def generate_workbook(path, rows, seed=0):
+    from openpyxl import Workbook
+    rng = np.random.default_rng(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Employees")
+    sheet.append(["Employee ID", "Name", "Email", "Department", "Phone", "City"])
+    departments = rng.choice(DEPARTMENTS, rows)
+    for i in range(rows):
+        sheet.append([i, f"emp{i:06d}", f"emp{i:06d}@example.com", departments[i], f"+91 9{i:09d}",
+                      f"City {i % 500}"])
+    workbook.save(path)
+
+
+def generate_resume(path, pages, lines_per_page=45):
+    # Minimal text-only PDF (Helvetica, one content stream per page), enough for PyPDF2 to extract from
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = " ".join(f"(Page {page + 1} line {line + 1}: Python, SQL, project delivery, stakeholder "
+                         f"management) Tj T*" for line in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 40 760 Td {lines} ET".encode()
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+                       f"/Contents {len(objects) + 2} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+# Measurement
+def measure(name, fn, iterations, rows_per_call=1):
+    # Latencies come from plain timed calls; peak memory from one extra call under tracemalloc,
+    # so tracing overhead doesn't skew the latency numbers.
+    latencies = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies = np.array(latencies) * 1000
+    return name, {
+        "calls": iterations,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "throughput_per_s": float(iterations * rows_per_call / (latencies.sum() / 1000)),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def measure_once(name, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return name, {"calls": 1, "p50_ms": elapsed, "p95_ms": elapsed, "p99_ms": elapsed, "mean_ms": elapsed,
+                  "throughput_per_s": 1000 / elapsed if elapsed else 0.0, "peak_mb": peak / 2 ** 20}
+
+
+def run_benchmarks(data_dir, names, sizes, iterations):
+    # crm_service binds its store to CRM_DATA_DIR on import, so it is imported only once the data exists
+    os.environ["CRM_DATA_DIR"] = data_dir
+    service = importlib.import_module("crm_service")
+    import crm_documents
+    store = service.store
+    today = crm_data.now().date()
+    calls = min(iterations, len(names))
+    results = []
+
+    for table in crm_data.TABLES:
+        results.append(measure_once(f"load {table}", lambda: store.load(table)))
+
+    results.append(measure("record_action", lambda i: service.record_action(names[i % len(names)], "Login"),
+                           iterations))
+    results.append(measure("record_attendance check-in",
+                           lambda i: service.record_attendance(names[i % len(names)], "Check-In"), calls))
+    results.append(measure("record_attendance check-out",
+                           lambda i: service.record_attendance(names[i % len(names)], "Check-Out"), calls))
+    batch = 1000
+    results.append(measure(
+        "record_attendance_bulk (1000)",
+        lambda i: service.record_attendance_bulk([
+            {"username": names[(i * batch + j) % len(names)], "action": "Check-In",
+             "timestamp": f"{today + timedelta(days=1 + (i * batch + j) // len(names))}T09:00:00"}
+            for j in range(batch)]),
+        max(iterations // 10, 3), rows_per_call=batch))
+    results.append(measure("apply_for_leave", lambda i: service.apply_for_leave(
+        names[i % len(names)], "Casual Leave", str(today), str(today + timedelta(days=1))), iterations))
+    results.append(measure("on_leave", lambda i: service.on_leave(today + timedelta(days=i % 365)), iterations))
+    team = names[:50]
+    results.append(measure("team_availability (50, one week)", lambda i: service.team_availability(
+        today + timedelta(days=i % 365), today + timedelta(days=i % 365 + 6), team), iterations))
+    results.append(measure("filter_login_details", lambda i: service.filter_login_details(
+        names[i % len(names)], today - timedelta(days=30), today), iterations))
+    results.append(measure("daily_logs", lambda i: service.daily_logs(), iterations))
+    results.append(measure("task search", lambda i: service.search_tasks(names[i % len(names)][:-1]), iterations))
+
+    workbook = os.path.join(data_dir, "employees.xlsx")
+    generate_workbook(workbook, sizes["workbook_rows"])
+    results.append(measure_once("employee details load", lambda: pd.read_excel(workbook)))
+    details = pd.read_excel(workbook)
+    results.append(measure("employee details search",
+                           lambda i: crm_documents.search_rows(details, DEPARTMENTS[i % len(DEPARTMENTS)]),
+                           max(iterations // 10, 3)))
+
+    resume = os.path.join(data_dir, "resume.pdf")
+    generate_resume(resume, sizes["resume_pages"])
+    results.append(measure("resume text extraction", lambda i: crm_documents.extract_pdf_text(resume),
+                           max(iterations // 20, 3)))
+    return dict(results)
+
+
+# Reporting
+def print_report(report):
+    print(f"preset={report['preset']} " + " ".join(f"{k}={v}" for k, v in report["sizes"].items()))
+    print(f"{'benchmark':<32}{'calls':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'ops/s':>12}{'peak MB':>10}")
+    for name, r in report["results"].items():
+        print(f"{name:<32}{r['calls']:>7}{r['p50_ms']:>11.3f}{r['p95_ms']:>11.3f}{r['p99_ms']:>11.3f}"
+              f"{r['throughput_per_s']:>12.1f}{r['peak_mb']:>10.2f}")
+    print(f"max RSS: {report['max_rss_mb']:.1f} MB")
+
+
+def compare(report, baseline, threshold):
+    # Returns the benchmarks whose p50 grew by more than threshold (a fraction) against the baseline
+    regressions = []
+    print(f"\n{'benchmark':<32}{'baseline p50':>14}{'p50':>11}{'change':>9}")
+    for name, r in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["p50_ms"]
+        change = (r["p50_ms"] - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:<32}{before:>14.3f}{r['p50_ms']:>11.3f}{change:>+9.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CRM hot paths against synthetic data.")
+    parser.add_argument("--preset", choices=PRESETS, default="small")
+    for size in PRESETS["small"]:
+        parser.add_argument(f"--{size.replace('_', '-')}", type=int, dest=size)
+    parser.add_argument("--iterations", type=int, default=200, help="calls per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="where to generate data (default: a temporary directory)")
+    parser.add_argument("--save", help="write the results to this JSON file as a baseline")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown before failing")
+    args = parser.parse_args(argv)
+
+    sizes = {k: getattr(args, k) or v for k, v in PRESETS[args.preset].items()}
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="crm_bench_")
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        names = generate_tables(data_dir, sizes, args.seed)
+        results = run_benchmarks(data_dir, names, sizes, args.iterations)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {"preset": args.preset, "sizes": sizes, "iterations": args.iterations, "results": results,
+              "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
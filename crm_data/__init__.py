@@ -0,0 +1,5 @@
+from crm_data.archive import ARCHIVE_DIR, ARCHIVED_TABLES
+from crm_data.schema import (ATTENDANCE_COLUMNS, DATE_FORMAT, LEAVE_COLUMNS, LOG_COLUMNS, SCHEMA_VERSION,
+                             TABLES, TASK_COLUMNS, TIME_FORMAT, TIMESTAMP_FORMAT, USER_COLUMNS, india_timezone, now,
+                             timestamp)
+from crm_data.store import DataDirectoryInUse, DataStore, claim, get_store
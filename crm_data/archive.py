@@ -0,0 +1,121 @@
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from crm_data.schema import LOG_COLUMNS, empty_frame
+
+ARCHIVE_DIR = "archive"
+
+# Tables whose old rows are moved out of the hot CSV, and the column whose first ten characters are the row's date
+ARCHIVED_TABLES = {"logs": "Timestamp", "attendance": "Date"}
+# Columns identifying a row, so a row that is already archived is recognised even if a stale copy was edited since
+ARCHIVE_KEYS = {"logs": LOG_COLUMNS, "attendance": ["Username", "Date"]}
+
+LOCK_FILE = ".compacting"
+STALE_LOCK_SECONDS = 3600  # a lock this old was left behind by a compactor that crashed
+
+
+# Segments are gzipped CSVs named archive/<table>/<YYYY-MM>.<n>.csv.gz, one month of rows each. They are written once
+# and never modified; rows archived later for a month that already has a segment go into the next <n>.
+def segment_dir(data_dir, name):
+    return os.path.join(data_dir, ARCHIVE_DIR, name)
+
+
+def segments(data_dir, name):
+    # [(month, sequence, path)] in date order
+    directory = segment_dir(data_dir, name)
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for file_name in os.listdir(directory):
+        if file_name.endswith(".csv.gz"):
+            month, sequence = file_name[:-len(".csv.gz")].split(".")
+            found.append((month, int(sequence), os.path.join(directory, file_name)))
+    return sorted(found)
+
+
+def row_dates(name, frame):
+    return frame[ARCHIVED_TABLES[name]].str[:10]
+
+
+def _take_lock(path):
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+@contextmanager
+def compaction_lock(data_dir):
+    # Yields whether this process may compact the data directory; the lock file works across processes and platforms
+    directory = os.path.join(data_dir, ARCHIVE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, LOCK_FILE)
+    acquired = _take_lock(path)
+    if not acquired:
+        try:
+            stale = time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS
+        except FileNotFoundError:
+            stale = True
+        if stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            acquired = _take_lock(path)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            os.remove(path)
+
+
+def write_segments(data_dir, name, rows):
+    # Returns the paths written. Each file is renamed into place once complete, so readers never see a partial one.
+    # Rows already in a segment of their month are skipped: a process holding an old copy of the table may have
+    # written archived rows back into the hot file.
+    directory = segment_dir(data_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    paths, last = {}, {}
+    for month, sequence, path in segments(data_dir, name):
+        paths.setdefault(month, []).append(path)
+        last[month] = sequence
+    written = []
+    for month, group in rows.groupby(row_dates(name, rows).str[:7], sort=True):
+        if month in paths:
+            keys = ARCHIVE_KEYS[name]
+            archived = pd.concat([_read_segment(path)[keys] for path in paths[month]]).drop_duplicates()
+            group = group.merge(archived, on=keys, how="left", indicator=True)
+            group = group[group["_merge"] == "left_only"].drop(columns="_merge")
+            if group.empty:
+                continue
+        path = os.path.join(directory, f"{month}.{last.get(month, -1) + 1}.csv.gz")
+        partial = path + ".tmp"
+        group.to_csv(partial, index=False, compression={"method": "gzip", "mtime": 0})
+        os.chmod(partial, 0o444)
+        os.replace(partial, path)
+        written.append(path)
+    return written
+
+
+def _read_segment(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, compression="gzip")
+
+
+def read_segments(data_dir, name, start_date=None, end_date=None):
+    # Only the segments for months between start_date and end_date (YYYY-MM-DD, inclusive) are opened
+    frames = [_read_segment(path)
+              for month, _, path in segments(data_dir, name)
+              if (not start_date or month >= start_date[:7]) and (not end_date or month <= end_date[:7])]
+    if not frames:
+        return empty_frame(name)
+    frame = pd.concat(frames, ignore_index=True)
+    dates = row_dates(name, frame)
+    if start_date:
+        frame = frame[dates >= start_date[:10]]
+    if end_date:
+        frame = frame[dates <= end_date[:10]]
+    return frame.reset_index(drop=True)
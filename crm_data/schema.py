@@ -0,0 +1,74 @@
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+# Bump when the on-disk layout changes and add a step to MIGRATIONS
+SCHEMA_VERSION = 2
+VERSION_FILE = "schema_version.txt"
+
+india_timezone = pytz.timezone('Asia/Kolkata')
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M:%S"
+
+USER_COLUMNS = ["Username", "password", "role"]
+TASK_COLUMNS = ["Task", "Priority", "Employee Name", "Employee Role", "Status", "Start Date", "End Date"]
+LOG_COLUMNS = ["Username", "Action", "Timestamp"]
+LEAVE_COLUMNS = ["Employee Name", "Leave Type", "Start Date", "End Date", "Status"]
+ATTENDANCE_COLUMNS = ["Username", "Date", "Check-In Time", "Check-Out Time", "Status"]
+
+# Every table is kept as text: dates and timestamps are stored in the formats above, so string comparison
+# is date comparison and a blank cell is "" rather than NaN.
+Table = namedtuple("Table", ["file", "columns", "date_columns", "timestamp_columns"])
+
+TABLES = {
+    "users": Table("users.csv", USER_COLUMNS, [], []),
+    "tasks": Table("tasks.csv", TASK_COLUMNS, ["Start Date", "End Date"], []),
+    "logs": Table("login_logout.csv", LOG_COLUMNS, [], ["Timestamp"]),
+    "leave": Table("leave_applications.csv", LEAVE_COLUMNS, ["Start Date", "End Date"], []),
+    "attendance": Table("attendance.csv", ATTENDANCE_COLUMNS, ["Date"], []),
+}
+
+
+def now():
+    return datetime.now(india_timezone)
+
+
+def timestamp(moment=None):
+    return (moment or now()).strftime(TIMESTAMP_FORMAT)
+
+
+def empty_frame(name):
+    return pd.DataFrame(columns=TABLES[name].columns, dtype=str)
+
+
+def as_text(frame):
+    # None/NaN become "", everything else (dates, numbers) its string form
+    return frame.astype(object).where(frame.notna(), "").astype(str)
+
+
+def _reformat(column, fmt):
+    # Values that don't parse are left untouched rather than dropped
+    parsed = pd.to_datetime(column.where(column != ""), errors="coerce", format="mixed")
+    return parsed.dt.strftime(fmt).where(parsed.notna(), column)
+
+
+def _conform(name, frame):
+    table = TABLES[name]
+    for column in table.columns:
+        if column not in frame.columns:
+            frame[column] = ""
+    for column in table.date_columns:
+        frame[column] = _reformat(frame[column], DATE_FORMAT)
+    # crm3.py/crm7.py used to log naive datetime.now() with microseconds; those are kept as wall-clock time
+    for column in table.timestamp_columns:
+        frame[column] = _reformat(frame[column], TIMESTAMP_FORMAT)
+    return frame
+
+
+# Each step takes (name, frame) and returns the frame at the next version
+MIGRATIONS = {
+    1: _conform,
+}
@@ -0,0 +1,266 @@
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import crm_metrics
+from crm_data.archive import ARCHIVED_TABLES, compaction_lock, read_segments, row_dates, write_segments
+from crm_data.schema import MIGRATIONS, SCHEMA_VERSION, TABLES, VERSION_FILE, as_text, empty_frame
+
+DEFAULT_USERS = {"admin": {"password": "admin123", "role": "admin"}}
+OWNER_FILE = ".owner.lock"
+
+
+class DataDirectoryInUse(RuntimeError):
+    pass
+
+
+class DataStore:
+    # Holds the tables of one data directory in memory; `users` is a dict keyed by username,
+    # the rest are DataFrames named after their key in TABLES. A table is only read from disk
+    # the first time it is accessed, so a page pays for the tables it uses and nothing else.
+    # `lock` is for callers sharing the store between threads; archive() is the only method taking it itself.
+
+    def __init__(self, data_dir=".", batch_writes=False):
+        self.data_dir = data_dir
+        self.lock = threading.RLock()
+        self.load_times = {}
+        self.batch_writes = False
+        self._dirty = set()
+        self._pending = {}
+        os.makedirs(data_dir, exist_ok=True)
+        if self.schema_version() < SCHEMA_VERSION:
+            self.migrate()
+        # With batch_writes, save() and append() only update memory; flush() writes the changes out
+        self.batch_writes = batch_writes
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't set yet, i.e. tables that haven't been loaded
+        if name in TABLES:
+            self.load(name)
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def path(self, file_name):
+        return os.path.join(self.data_dir, file_name)
+
+    def schema_version(self):
+        # Data directories written before versioning count as version 1
+        try:
+            with open(self.path(VERSION_FILE)) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 1
+
+    def migrate(self):
+        version = self.schema_version()
+        for name in TABLES:
+            frame = self._read(name)
+            for step in range(version, SCHEMA_VERSION):
+                frame = MIGRATIONS[step](name, frame)
+            self._set(name, frame)
+            self.save(name)
+        with open(self.path(VERSION_FILE), "w") as f:
+            f.write(str(SCHEMA_VERSION))
+
+    def _read(self, name):
+        path = self.path(TABLES[name].file)
+        try:
+            with crm_metrics.span(f"load {name}"):
+                frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+            if crm_metrics.enabled:
+                crm_metrics.count("rows_read", len(frame), table=name)
+                crm_metrics.count("disk_read_bytes", os.path.getsize(path), table=name)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            frame = None
+        if name == "users" and (frame is None or "Username" not in frame.columns):
+            frame = pd.DataFrame.from_dict(DEFAULT_USERS, orient="index").reset_index().rename(
+                columns={"index": "Username"})
+        return frame if frame is not None else empty_frame(name)
+
+    def _set(self, name, frame):
+        if name == "users":
+            self.users = frame.set_index("Username").to_dict("index")
+        else:
+            setattr(self, name, frame)
+
+    def _header(self, name):
+        try:
+            with open(self.path(TABLES[name].file), newline="") as f:
+                return next(csv.reader(f), None)
+        except FileNotFoundError:
+            return None
+
+    def load(self, name):
+        started = time.perf_counter()
+        self._set(name, self._read(name))
+        if not os.path.exists(self.path(TABLES[name].file)):
+            self.save(name)
+        self.load_times[name] = time.perf_counter() - started
+
+    def loaded(self, name):
+        return name in self.__dict__
+
+    def frame(self, name):
+        if name == "users":
+            return pd.DataFrame.from_dict(self.users, orient="index", columns=TABLES["users"].columns[1:]) \
+                .rename_axis("Username").reset_index()
+        return getattr(self, name)
+
+    def save(self, name):
+        if self.batch_writes:
+            self._dirty.add(name)
+            self._pending.pop(name, None)  # the full rewrite will include any queued rows
+            return
+        self._write(name)
+
+    def _write(self, name):
+        path = self.path(TABLES[name].file)
+        frame = self.frame(name)
+        with crm_metrics.span(f"save {name}"):
+            frame.to_csv(path, index=False)
+        if crm_metrics.enabled:
+            crm_metrics.count("rows_written", len(frame), table=name)
+            crm_metrics.count("disk_write_bytes", os.path.getsize(path), table=name)
+
+    def _write_rows(self, name, rows, header):
+        # Appends rows to the file, or rewrites the (already updated) table when the file's header doesn't match
+        if header != TABLES[name].columns:
+            self._write(name)
+            return
+        path = self.path(TABLES[name].file)
+        size = os.path.getsize(path) if crm_metrics.enabled else 0
+        with crm_metrics.span(f"append {name}"):
+            rows.to_csv(path, mode="a", header=False, index=False)
+        if crm_metrics.enabled:
+            crm_metrics.count("rows_written", len(rows), table=name)
+            crm_metrics.count("disk_write_bytes", os.path.getsize(path) - size, table=name)
+
+    def append(self, name, rows):
+        # rows is a DataFrame or a list of dicts/sequences in the table's column order. When the file already
+        # has the table's header only the new rows are written, and a table nobody has loaded stays unloaded.
+        columns = TABLES[name].columns
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(list(rows), columns=columns)
+        if rows.empty:
+            return 0
+        rows = as_text(rows[columns])
+        if self.batch_writes:
+            setattr(self, name, pd.concat([getattr(self, name), rows], ignore_index=True))
+            if name not in self._dirty:
+                self._pending.setdefault(name, []).append(rows)
+            return len(rows)
+        header = self._header(name)
+        if self.loaded(name) or header != columns:
+            setattr(self, name, pd.concat([getattr(self, name), rows], ignore_index=True))
+        self._write_rows(name, rows, header)
+        return len(rows)
+
+    def flush(self):
+        # Writes everything queued while batch_writes is on: full rewrites first, then appended rows. A table that
+        # fails to write is marked for a full rewrite on the next flush (an append may have been cut off part way),
+        # and the first error is raised once the other tables are written.
+        dirty, pending = self._dirty, self._pending
+        self._dirty, self._pending = set(), {}
+        error = None
+        for name in list(dirty) + [name for name in pending if name not in dirty]:
+            try:
+                if name in dirty:
+                    self._write(name)
+                else:
+                    self._write_rows(name, pd.concat(pending[name], ignore_index=True), self._header(name))
+            except Exception as e:
+                self._dirty.add(name)
+                self._pending.pop(name, None)
+                error = error or e
+        if error is not None:
+            raise error
+        return len(dirty) + len(pending)
+
+    def archive(self, name, before, on_archived=None):
+        # Moves the rows of an ARCHIVED_TABLES table dated before `before` (YYYY-MM-DD) into archive segments and
+        # rewrites the hot file without them right away, even with batch_writes, so no row is in both places for long.
+        # Returns the rows moved, or 0 when another process is compacting the same data directory.
+        # Safe to run in a background thread: `lock` is only held to take a copy of the table and to swap in the
+        # remaining rows, not while the segments are written. on_archived(name) is called before it is released.
+        if name not in ARCHIVED_TABLES:
+            raise ValueError(f"Table '{name}' is not archived")
+        with compaction_lock(self.data_dir) as acquired:
+            if not acquired:
+                return 0
+            with self.lock:
+                if self.batch_writes:
+                    self.flush()
+                frame = self.frame(name).copy()
+            dates = row_dates(name, frame)
+            old = ((dates != "") & (dates < before)).to_numpy()
+            if not old.any():
+                return 0
+            with crm_metrics.span(f"archive {name}"):
+                write_segments(self.data_dir, name, frame[old])
+                with self.lock:
+                    current = self.frame(name)
+                    # These tables only grow by appends, so the copied rows are still the first ones, unless the
+                    # table was cleared meanwhile; then there is nothing left to remove
+                    if len(current) >= len(frame):
+                        keep = np.concatenate([~old, np.ones(len(current) - len(frame), dtype=bool)])
+                        setattr(self, name, current[keep].reset_index(drop=True))
+                        self._dirty.discard(name)
+                        self._pending.pop(name, None)  # rows appended meanwhile are part of the rewrite
+                        self._write(name)
+                    if on_archived is not None:
+                        on_archived(name)
+        if crm_metrics.enabled:
+            crm_metrics.count("rows_archived", int(old.sum()), table=name)
+        return int(old.sum())
+
+    def archived(self, name, start_date=None, end_date=None):
+        return read_segments(self.data_dir, name, start_date, end_date)
+
+    def clear(self, name):
+        setattr(self, name, empty_frame(name))
+        self.save(name)
+
+
+def claim(data_dir):
+    # Locks the data directory for this process, or raises DataDirectoryInUse. Every process keeps its own copy of
+    # the tables, so a full save in one would drop the rows another appended. The OS drops the lock when the
+    # process exits, crashed or not. Keep the returned file open for as long as the data is in use.
+    os.makedirs(data_dir, exist_ok=True)
+    handle = open(os.path.join(data_dir, OWNER_FILE), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        raise DataDirectoryInUse(
+            f"Another process is using the data directory {os.path.abspath(data_dir)}. To run several processes "
+            f"on it, start a state server (crm_state.py) and set CRM_STATE_SOCKET in each of them.") from None
+    return handle
+
+
+_store = None
+_owner = None
+
+
+def get_store():
+    # One store per process; the data directory comes from CRM_DATA_DIR (defaults to the working directory) and
+    # is claimed before anything is read from it
+    global _store, _owner
+    if _store is None:
+        data_dir = os.environ.get("CRM_DATA_DIR", ".")
+        _owner = _owner or claim(data_dir)
+        _store = DataStore(data_dir)
+    return _store
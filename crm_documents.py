@@ -0,0 +1,20 @@
+import pandas as pd
+
+import crm_metrics
+
+
+@crm_metrics.timed()
+def search_rows(frame, term):
+    # Rows where any cell contains term (case-insensitive); one vectorized pass per column
+    mask = pd.Series(False, index=frame.index)
+    for column in frame.columns:
+        mask |= frame[column].astype(str).str.contains(term, case=False, na=False)
+    return frame[mask]
+
+
+@crm_metrics.timed()
+def extract_pdf_text(path):
+    from PyPDF2 import PdfReader
+    with open(path, "rb") as f:
+        pdf_reader = PdfReader(f)
+        return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
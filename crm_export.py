@@ -0,0 +1,78 @@
+import os
+import tempfile
+import zlib
+import pandas as pd
+from openpyxl import Workbook
+
+import crm_service as service
+
+CHUNK_SIZE = 10000
+FORMATS = ["csv", "xlsx"]
+EXPORT_TABLES = ["attendance", "logs", "tasks", "leave"]
+MIME_TYPES = {"csv": "text/csv",
+              "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+              "gz": "application/gzip"}
+
+
+def table(name):
+    return service.table(name)
+
+
+def tables():
+    return {name: table(name) for name in EXPORT_TABLES}
+
+
+def _csv_chunks(frame, chunksize):
+    yield frame.iloc[:0].to_csv(index=False).encode()
+    for start in range(0, len(frame), chunksize):
+        yield frame.iloc[start:start + chunksize].to_csv(index=False, header=False).encode()
+
+
+def _xlsx_chunks(frame, chunksize, sheet_name):
+    # Write-only workbooks stream rows to disk; the finished file is then read back in blocks
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append([str(c) for c in frame.columns])
+    for start in range(0, len(frame), chunksize):
+        for row in frame.iloc[start:start + chunksize].itertuples(index=False):
+            sheet.append([None if pd.isna(v) else v for v in row])
+    with tempfile.TemporaryFile() as target:
+        workbook.save(target)
+        target.seek(0)
+        while True:
+            block = target.read(64 * 1024)
+            if not block:
+                break
+            yield block
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(frame, fmt="csv", compress=False, chunksize=CHUNK_SIZE, sheet_name="Sheet1"):
+    # Generator of bytes; nothing is rendered until the caller starts iterating
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    chunks = _xlsx_chunks(frame, chunksize, sheet_name) if fmt == "xlsx" else _csv_chunks(frame, chunksize)
+    return _gzip(chunks) if compress else chunks
+
+
+def export_filename(name, fmt="csv", compress=False):
+    return f"{name}_export.{fmt}" + (".gz" if compress else "")
+
+
+def export_mime_type(fmt="csv", compress=False):
+    return MIME_TYPES["gz" if compress else fmt]
+
+
+def export_to_file(frame, path, fmt="csv", compress=False, chunksize=CHUNK_SIZE):
+    with open(path, "wb") as f:
+        for chunk in export_chunks(frame, fmt, compress, chunksize):
+            f.write(chunk)
+    return os.path.getsize(path)
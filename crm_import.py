@@ -0,0 +1,189 @@
+import os
+import pandas as pd
+from openpyxl import load_workbook
+
+import crm_data
+import crm_metrics
+import crm_service as service
+
+CHUNK_SIZE = 10000
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def _excel_chunks(source, chunksize):
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c).strip() if c is not None else "" for c in next(rows, [])]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+
+def read_chunks(source, filename, chunksize=CHUNK_SIZE):
+    # Yields DataFrames of at most chunksize rows; the format is picked from the file name
+    if os.path.splitext(filename)[1].lower() in EXCEL_EXTENSIONS:
+        chunks = _excel_chunks(source, chunksize)
+    else:
+        # Blank lines are kept (and rejected as empty rows) so row numbers match the file's line numbers
+        chunks = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False, skip_blank_lines=False)
+    for chunk in chunks:
+        chunk.columns = [str(c).strip() for c in chunk.columns]
+        yield chunk
+
+
+def _text(column):
+    return column.fillna("").astype(str).str.strip()
+
+
+def _canonical(column, allowed):
+    # Case-insensitive match against the allowed values; anything else becomes NaN
+    lookup = {value.lower(): value for value in allowed}
+    return _text(column).str.lower().map(lookup)
+
+
+def _dates(column):
+    # ISO dates take the fast vectorized path; only the leftovers go through per-value format inference
+    text = _text(column)
+    parsed = pd.to_datetime(text, errors="coerce", format="ISO8601")
+    leftover = parsed.isna() & (text != "")
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(text[leftover], errors="coerce", format="mixed")
+    return parsed
+
+
+def _times(column):
+    text = _text(column)
+    parsed = pd.to_datetime(text, errors="coerce", format="%H:%M:%S")
+    return parsed.fillna(pd.to_datetime(text, errors="coerce", format="%H:%M"))
+
+
+def _reject(reasons, mask, reason):
+    # Keeps the first reason per row
+    reasons[mask & (reasons == "")] = reason
+
+
+def _split(frame, reasons, first_row):
+    # Indexes the normalized frame by source row number and separates valid rows from rejected ones
+    frame.index = frame.index + first_row
+    invalid = (reasons != "").values
+    rejected = pd.DataFrame({"Row": frame.index[invalid], "Reason": reasons.values[invalid]})
+    return frame[~invalid], rejected
+
+
+def _missing_columns(chunk, required):
+    return [c for c in required if c not in chunk.columns]
+
+
+def _empty_rows(chunk):
+    return chunk.apply(lambda column: _text(column) == "").all(axis=1)
+
+
+def validate_tasks(chunk, first_row=2):
+    # Returns (valid rows in TASK_COLUMNS order indexed by source row, rejected rows as Row/Reason)
+    missing = _missing_columns(chunk, crm_data.TASK_COLUMNS)
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    chunk = chunk.reset_index(drop=True)
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+
+    task = _text(chunk["Task"])
+    employee = _text(chunk["Employee Name"])
+    priority = _canonical(chunk["Priority"], service.PRIORITIES)
+    role = _canonical(chunk["Employee Role"], service.EMPLOYEE_ROLES)
+    status = _canonical(chunk["Status"], service.TASK_STATUSES)
+    start_date, end_date = _dates(chunk["Start Date"]), _dates(chunk["End Date"])
+
+    _reject(reasons, _empty_rows(chunk), "Empty row")
+    _reject(reasons, task == "", "Task name is empty")
+    _reject(reasons, ~employee.isin(service.employee_names()), "Unknown employee")
+    _reject(reasons, priority.isna(), "Invalid priority")
+    _reject(reasons, role.isna(), "Invalid employee role")
+    _reject(reasons, status.isna(), "Invalid status")
+    _reject(reasons, start_date.isna() | end_date.isna(), "Invalid date")
+    _reject(reasons, end_date < start_date, "End Date is before Start Date")
+
+    tasks = pd.DataFrame({
+        "Task": task, "Priority": priority, "Employee Name": employee, "Employee Role": role, "Status": status,
+        "Start Date": start_date.dt.strftime("%Y-%m-%d"), "End Date": end_date.dt.strftime("%Y-%m-%d"),
+    })
+    return _split(tasks, reasons, first_row)
+
+
+def validate_attendance(chunk, first_row=2):
+    missing = _missing_columns(chunk, ["Username", "Date", "Check-In Time"])
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    chunk = chunk.reset_index(drop=True)
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+
+    username = _text(chunk["Username"])
+    date = _dates(chunk["Date"])
+    check_in = _times(chunk["Check-In Time"])
+    check_out_text = _text(chunk["Check-Out Time"]) if "Check-Out Time" in chunk.columns else \
+        pd.Series("", index=chunk.index)
+    check_out = _times(check_out_text)
+
+    _reject(reasons, _empty_rows(chunk), "Empty row")
+    _reject(reasons, ~username.isin(service.usernames()), "Unknown user")
+    _reject(reasons, date.isna(), "Invalid date")
+    _reject(reasons, check_in.isna(), "Invalid Check-In Time")
+    _reject(reasons, (check_out_text != "") & check_out.isna(), "Invalid Check-Out Time")
+    _reject(reasons, check_out < check_in, "Check-Out Time is before Check-In Time")
+
+    attendance = pd.DataFrame({
+        "Username": username,
+        "Date": date.dt.strftime("%Y-%m-%d"),
+        "Check-In Time": check_in.dt.strftime("%H:%M:%S"),
+        "Check-Out Time": check_out.dt.strftime("%H:%M:%S").fillna(""),
+        "Status": check_out.isna().map({True: "Checked In", False: "Checked Out"}),
+    })
+    return _split(attendance, reasons, first_row)
+
+
+def _import(source, filename, validate, commit, chunksize):
+    valid_chunks, rejected_chunks = [], []
+    first_row = 2  # row 1 is the header
+    for chunk in read_chunks(source, filename, chunksize):
+        valid, rejected = validate(chunk, first_row)
+        valid_chunks.append(valid)
+        rejected_chunks.append(rejected)
+        first_row += len(chunk)
+    rejected = pd.concat(rejected_chunks, ignore_index=True) if rejected_chunks else \
+        pd.DataFrame(columns=["Row", "Reason"])
+    valid = pd.concat(valid_chunks) if valid_chunks else None
+    imported, rejected = commit(valid, rejected)
+    rejected = rejected.sort_values("Row", ignore_index=True)
+    return {"imported": imported, "rejected": len(rejected), "rejected_rows": rejected}
+
+
+@crm_metrics.timed()
+def import_tasks(source, filename, chunksize=CHUNK_SIZE):
+    def commit(tasks, rejected):
+        # The chunks were validated as they were read; add_tasks would only parse the dates a second time
+        return (service.add_tasks(tasks, validated=True)[0] if tasks is not None else 0), rejected
+
+    return _import(source, filename, validate_tasks, commit, chunksize)
+
+
+@crm_metrics.timed()
+def import_attendance(source, filename, chunksize=CHUNK_SIZE):
+    def commit(attendance, rejected):
+        if attendance is None:
+            return 0, rejected
+        # One record per user and day: rows already on file or repeated within the import are skipped
+        added, duplicates = service.add_attendance(attendance)
+        if duplicates:
+            duplicates = pd.DataFrame({"Row": duplicates,
+                                       "Reason": "Attendance already recorded for this user and date"})
+            rejected = pd.concat([rejected, duplicates], ignore_index=True)
+        return added, rejected
+
+    return _import(source, filename, validate_attendance, commit, chunksize)
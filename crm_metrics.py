@@ -0,0 +1,148 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set CRM_METRICS=0 to turn instrumentation off; spans and counters then return before doing any work
+enabled = os.environ.get("CRM_METRICS", "1") != "0"
+
+_lock = threading.Lock()
+_spans = {}  # name -> [count, total seconds, max seconds]
+_counters = {}  # (metric, labels) -> value
+_http_server = None
+_http_failed = False  # the port couldn't be bound; not retried on every Streamlit rerun
+logger = logging.getLogger("crm_metrics")
+
+
+def observe(name, seconds):
+    if not enabled:
+        return
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            _spans[name] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+
+@contextmanager
+def span(name):
+    if not enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+def timed(name=None):
+    # Decorator form of span(); the enabled check happens per call so it can be toggled at runtime
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(span_name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def count(metric, value=1, **labels):
+    if not enabled:
+        return
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def spans():
+    with _lock:
+        return {name: {"count": c, "total_s": total, "mean_s": total / c, "max_s": peak}
+                for name, (c, total, peak) in _spans.items()}
+
+
+def counters():
+    with _lock:
+        return [{"metric": metric, "labels": dict(labels), "value": value}
+                for (metric, labels), value in _counters.items()]
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}" if labels else ""
+
+
+def prometheus_text():
+    # Prometheus text exposition format (version 0.0.4)
+    lines = ["# TYPE crm_span_seconds summary"]
+    with _lock:
+        span_items = sorted(_spans.items())
+        counter_items = sorted(_counters.items())
+    for name, (c, total, _) in span_items:
+        lines.append(f"crm_span_seconds_count{_labels([('span', name)])} {c}")
+        lines.append(f"crm_span_seconds_sum{_labels([('span', name)])} {total:.9f}")
+    lines.append("# TYPE crm_span_seconds_max gauge")
+    for name, (_, _, peak) in span_items:
+        lines.append(f"crm_span_seconds_max{_labels([('span', name)])} {peak:.9f}")
+    typed = set()
+    for (metric, labels), value in counter_items:
+        if metric not in typed:
+            lines.append(f"# TYPE crm_{metric}_total counter")
+            typed.add(metric)
+        lines.append(f"crm_{metric}_total{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # a scrape every few seconds would flood the log
+
+
+def serve_http(port, host="127.0.0.1"):
+    # Serves GET /metrics from a daemon thread, for processes without a web server of their own (the Streamlit app,
+    # the state server). Only the first call in a process starts it, so it is safe to call on every Streamlit rerun.
+    # Returns None when the port can't be bound (e.g. already in use); that is logged once and not retried.
+    global _http_server, _http_failed
+    with _lock:
+        if _http_server is None and not _http_failed:
+            try:
+                _http_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                _http_failed = True
+                logger.exception("Can't serve metrics on %s:%s", host, port)
+                return None
+            threading.Thread(target=_http_server.serve_forever, name="crm-metrics-http", daemon=True).start()
+        return _http_server
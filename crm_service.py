@@ -0,0 +1,472 @@
+import asyncio
+import functools
+import os
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+
+import crm_data
+import crm_metrics
+from crm_availability import AbsenceIndex, LeaveIndex
+import crm_state
+from crm_data import ATTENDANCE_COLUMNS, TASK_COLUMNS
+
+PRIORITIES = ["High", "Medium", "Low"]
+EMPLOYEE_ROLES = ["Manager", "Staff", "Intern"]
+TASK_STATUSES = ["Done", "Delayed", "To be Done", "On Track", "Not Done"]
+LEAVE_TYPES = ["Sick Leave", "Casual Leave", "Annual Leave"]
+ATTENDANCE_ACTIONS = ["Check-In", "Check-Out"]
+
+# Login logs and attendance older than this many days are moved into compressed archive segments
+RETENTION_DAYS = int(os.environ.get("CRM_RETENTION_DAYS", 90))
+COMPACTION_INTERVAL = 3600  # seconds between background compactions
+
+# With CRM_STATE_SOCKET set the state server holds the data (see REMOTE_FUNCTIONS), so this process opens none
+store = None if crm_state.socket_path() else crm_data.get_store()
+
+# Indexes over the leave and attendance tables, built on first use and kept up to date by the functions below;
+# one is rebuilt if its table's length no longer matches, i.e. the table was changed some other way
+_indexes = {}
+
+
+class AttendanceKeys(dict):
+    # (Username, Date) -> row label of that day's attendance record
+    def __init__(self, attendance):
+        super().__init__(zip(zip(attendance["Username"], attendance["Date"]), attendance.index))
+        self.rows = len(attendance)
+
+
+# index name -> (table it covers, class building it from the table)
+INDEXES = {"leave": ("leave", LeaveIndex), "absences": ("attendance", AbsenceIndex),
+           "attendance": ("attendance", AttendanceKeys)}
+
+
+# Users
+def login(username, password):
+    users = store.users
+    return users[username]["role"] if username in users and users[username]["password"] == password else None
+
+
+@crm_metrics.timed()
+def register_user(username, password, role):
+    if username in store.users:
+        return False, "Username already exists!"
+    if not username.strip() or not password.strip():
+        return False, "Username and password cannot be empty!"
+    store.users[username] = {"password": password, "role": role}
+    store.save("users")
+    return True, f"Account created for {username} as {role}."
+
+
+@crm_metrics.timed()
+def delete_user(username):
+    if username in store.users:
+        del store.users[username]
+        store.save("users")
+        return True
+    return False
+
+
+def employee_names():
+    return [u for u, d in store.users.items() if d["role"] == "employee"]
+
+
+def usernames():
+    return list(store.users)
+
+
+def table(name):
+    # Whole table as a DataFrame (users included); read-only use, mutations go through the functions here
+    return store.frame(name)
+
+
+# Login/logout log
+@crm_metrics.timed()
+def record_action(username, action):
+    store.append("logs", [[username, action, crm_data.timestamp()]])
+
+
+@crm_metrics.timed()
+def delete_all_login_logout_details():
+    # Clears the current log only; archived segments are immutable and stay queryable
+    store.clear("logs")
+
+
+@crm_metrics.timed()
+def filter_login_details(username=None, start_date=None, end_date=None, include_archive=False):
+    filtered_data = _with_archive("logs", include_archive, start_date, end_date)
+    if username:
+        filtered_data = filtered_data[filtered_data["Username"] == username]
+    if start_date:
+        filtered_data = filtered_data[filtered_data["Timestamp"] >= str(start_date)]
+    if end_date:
+        filtered_data = filtered_data[filtered_data["Timestamp"] <= str(end_date)]
+    return filtered_data
+
+
+@crm_metrics.timed()
+def daily_logs():
+    today = crm_data.now().date()
+    return store.logs[store.logs["Timestamp"].str.startswith(str(today))]
+
+
+# Tasks
+@crm_metrics.timed()
+def add_tasks(rows, validated=False):
+    # rows are a DataFrame or sequences in TASK_COLUMNS order. They go through the same checks as an import
+    # (known employee, allowed priority/role/status, valid dates) and the valid ones are written with a single
+    # to_csv; returns (rows added, rejected rows as Row/Reason with Row the 0-based position in rows).
+    # validated is for rows crm_import.validate_tasks already returned as valid; they are written as they are.
+    import crm_import
+    if not isinstance(rows, pd.DataFrame):
+        rows = pd.DataFrame(list(rows), columns=TASK_COLUMNS)
+    if validated:
+        return store.append("tasks", rows), pd.DataFrame(columns=["Row", "Reason"])
+    valid, rejected = crm_import.validate_tasks(rows, first_row=0)
+    return store.append("tasks", valid), rejected
+
+
+def add_task(task, priority, employee_name, employee_role, status, start_date, end_date):
+    if not task.strip():
+        return False, "Task name cannot be empty!"
+    _, rejected = add_tasks([[task, priority, employee_name, employee_role, status, start_date, end_date]])
+    if not rejected.empty:
+        return False, f"{rejected['Reason'].iloc[0]}!"
+    return True, "Task added!"
+
+
+@crm_metrics.timed()
+def update_task_status(index, status):
+    if status not in TASK_STATUSES:
+        raise ValueError(f"Invalid status '{status}'")
+    if index not in store.tasks.index:
+        return False
+    store.tasks.at[index, "Status"] = status
+    store.save("tasks")
+    return True
+
+
+@crm_metrics.timed()
+def search_tasks(employee_name):
+    return store.tasks[store.tasks["Employee Name"].str.contains(employee_name, case=False, na=False)]
+
+
+def employee_tasks(employee_name):
+    return store.tasks[store.tasks["Employee Name"] == employee_name]
+
+
+@crm_metrics.timed()
+def delete_task_data(delete_all=False, index=None):
+    if delete_all:
+        store.clear("tasks")
+    elif index is not None:
+        store.tasks = store.tasks.drop(index=index).reset_index(drop=True)
+        store.save("tasks")
+
+
+# Leave
+def _day(value):
+    # Dates arrive as date objects from the UI and as strings from the API; raises ValueError for anything else
+    return datetime.fromisoformat(str(value)).strftime(crm_data.DATE_FORMAT)
+
+
+def _index(name):
+    table, build = INDEXES[name]
+    frame = getattr(store, table)
+    index = _indexes.get(name)
+    if index is None or index.rows != len(frame):
+        with crm_metrics.span(f"index {name}"):
+            index = _indexes[name] = build(frame)
+    return index
+
+
+def leave_overlaps(employee_name, start_date, end_date):
+    # The employee's accepted and pending applications sharing a day with the range
+    overlaps = store.leave.loc[_index("leave").overlapping(_day(start_date), _day(end_date))]
+    return overlaps[overlaps["Employee Name"] == employee_name]
+
+
+@crm_metrics.timed()
+def apply_for_leave(employee_name, leave_type, start_date, end_date):
+    # Returns (ok, message); ok is False when the dates overlap another application. An unknown employee or leave
+    # type, dates that can't be parsed and a range ending before it starts are bad input and raise ValueError.
+    if employee_name not in employee_names():
+        raise ValueError(f"Unknown employee '{employee_name}'")
+    if leave_type not in LEAVE_TYPES:
+        raise ValueError(f"Invalid leave type '{leave_type}'")
+    start_date, end_date = _day(start_date), _day(end_date)
+    if end_date < start_date:
+        raise ValueError("End date cannot be before the start date!")
+    overlaps = leave_overlaps(employee_name, start_date, end_date)
+    if not overlaps.empty:
+        existing = overlaps.iloc[0]
+        return False, (f"These dates overlap your {existing['Status'].lower()} {existing['Leave Type']} from "
+                       f"{existing['Start Date']} to {existing['End Date']}!")
+    store.append("leave", [[employee_name, leave_type, start_date, end_date, "Pending"]])
+    index = _indexes["leave"]
+    index.update(store.leave.index[-1], start_date, end_date, "Pending")
+    index.rows += 1
+    return True, "Leave application submitted!"
+
+
+def pending_leaves():
+    return store.leave[store.leave["Status"] == "Pending"]
+
+
+def employee_leaves(employee_name):
+    return store.leave[store.leave["Employee Name"] == employee_name]
+
+
+@crm_metrics.timed()
+def update_leave_status(index, status):
+    # Returns the employee the application belongs to, or None if it doesn't exist
+    if index not in store.leave.index:
+        return None
+    store.leave.at[index, "Status"] = status
+    store.save("leave")
+    if "leave" in _indexes:
+        _indexes["leave"].update(index, store.leave.at[index, "Start Date"], store.leave.at[index, "End Date"], status)
+    return store.leave.at[index, "Employee Name"]
+
+
+@crm_metrics.timed()
+def on_leave(start_date, end_date=None, employees=None, include_pending=True):
+    # Applications covering any day from start_date to end_date (default: just start_date), optionally limited to
+    # the given employees; on_leave(day) answers "who is on leave on that day"
+    leave = store.leave.loc[_index("leave").overlapping(_day(start_date), _day(end_date or start_date))]
+    if not include_pending:
+        leave = leave[leave["Status"] == "Accepted"]
+    if employees is not None:
+        leave = leave[leave["Employee Name"].isin(list(employees))]
+    return leave
+
+
+@crm_metrics.timed()
+def absences(start_date, end_date=None, employees=None):
+    # Runs of days without an attendance record between two recorded days of a user, overlapping the range
+    rows = _index("absences").overlapping(_day(start_date), _day(end_date or start_date))
+    absent = pd.DataFrame(rows, columns=["Username", "Start Date", "End Date"])
+    if employees is not None:
+        absent = absent[absent["Username"].isin(list(employees))]
+    return absent
+
+
+def team_availability(start_date, end_date=None, employees=None, include_absences=False):
+    # How many of the employees (all registered employees by default) are out at some point in the range, and who
+    employees = employee_names() if employees is None else list(employees)
+    out = set(on_leave(start_date, end_date, employees)["Employee Name"])
+    if include_absences:
+        out |= set(absences(start_date, end_date, employees)["Username"])
+    return {"employees": len(employees), "out": len(out), "available": len(employees) - len(out),
+            "out_names": sorted(out)}
+
+
+# Attendance
+@crm_metrics.timed()
+def record_attendance_bulk(entries):
+    # entries are dicts with "username", "action" and an optional "timestamp" (datetime or ISO string, converted
+    # to IST when it carries a timezone; defaults to now in IST). Returns one (ok, message) per entry and writes
+    # attendance.csv at most once.
+    attendance = store.attendance
+    recorded = _index("attendance")
+    first_label = len(attendance)
+    checked_in = {}  # records created by this call, not in the table yet
+    new_rows = []
+    changed = False
+    results = []
+    for entry in entries:
+        username, action = entry["username"], entry["action"]
+        if username not in store.users:
+            results.append((False, f"Unknown user '{username}'."))
+            continue
+        timestamp = entry.get("timestamp") or crm_data.now()
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(crm_data.india_timezone)  # naive timestamps are taken as IST already
+        today, current_time = timestamp.strftime(crm_data.DATE_FORMAT), timestamp.strftime(crm_data.TIME_FORMAT)
+        record = checked_in.get((username, today))
+        if record is None:
+            record = recorded.get((username, today))
+
+        if action == "Check-In":
+            if record is not None:
+                results.append((False, "You have already checked in today!"))
+            else:
+                row = {"Username": username, "Date": today, "Check-In Time": current_time, "Check-Out Time": "",
+                       "Status": "Checked In"}
+                new_rows.append(row)
+                checked_in[(username, today)] = row
+                results.append((True, "Successfully checked in!"))
+
+        elif action == "Check-Out":
+            if record is None:
+                results.append((False, "You haven't checked in today!"))
+                continue
+            check_in, check_out = (record["Check-In Time"], record["Check-Out Time"]) if isinstance(record, dict) \
+                else (attendance.at[record, "Check-In Time"], attendance.at[record, "Check-Out Time"])
+            if check_out:
+                results.append((False, "You have already checked out today!"))
+            elif current_time < check_in:
+                # Same rule as the import
+                results.append((False, "Check-Out Time is before Check-In Time!"))
+            elif isinstance(record, dict):
+                record["Check-Out Time"], record["Status"] = current_time, "Checked Out"
+                results.append((True, "Successfully checked out!"))
+            else:
+                attendance.at[record, "Check-Out Time"] = current_time
+                attendance.at[record, "Status"] = "Checked Out"
+                changed = True
+                results.append((True, "Successfully checked out!"))
+
+        else:
+            results.append((False, f"Unknown attendance action '{action}'."))
+
+    new_rows = pd.DataFrame(new_rows, columns=ATTENDANCE_COLUMNS, dtype=str)
+    if changed:
+        # Check-outs edit rows already on file, so the whole table is rewritten, new check-ins included
+        if not new_rows.empty:
+            store.attendance = pd.concat([attendance, new_rows], ignore_index=True)
+        store.save("attendance")
+    elif not new_rows.empty:
+        store.append("attendance", new_rows)
+    _index_attendance(new_rows["Username"], new_rows["Date"], first_label)
+    return results
+
+
+@crm_metrics.timed()
+def add_attendance(records):
+    # records is a DataFrame in ATTENDANCE_COLUMNS, written with a single append. Rows for a user and date that
+    # already have a record (on file or earlier in records) are skipped; returns (rows added, their index labels).
+    recorded = store.attendance
+    first_label = len(recorded)
+    existing = pd.MultiIndex.from_arrays([recorded["Username"], recorded["Date"]])
+    keys = pd.MultiIndex.from_arrays([records["Username"], records["Date"]])
+    duplicate = keys.isin(existing) | keys.duplicated()
+    added = store.append("attendance", records[~duplicate])
+    _index_attendance(records["Username"][~duplicate], records["Date"][~duplicate], first_label)
+    return added, records.index[duplicate].tolist()
+
+
+def _index_attendance(usernames, dates, first_label):
+    # Adds rows just appended to the attendance table, labelled from first_label on, to the indexes built so far
+    days = list(zip(usernames, dates))
+    keys, absences = _indexes.get("attendance"), _indexes.get("absences")
+    if keys is not None:
+        for label, day in enumerate(days, first_label):
+            keys[day] = label
+        keys.rows += len(days)
+    if absences is not None:
+        for username, day in days:
+            absences.add(username, day)
+        absences.rows += len(days)
+
+
+def record_attendance(username, action):
+    return record_attendance_bulk([{"username": username, "action": action}])[0]
+
+
+def today_attendance(username):
+    label = _index("attendance").get((username, str(crm_data.now().date())))
+    return store.attendance.loc[[] if label is None else [label]]
+
+
+@crm_metrics.timed()
+def filter_attendance(username=None, start_date=None, end_date=None, include_archive=False):
+    filtered_attendance = _with_archive("attendance", include_archive, start_date, end_date)
+    if username:
+        filtered_attendance = filtered_attendance[filtered_attendance["Username"] == username]
+    if start_date:
+        filtered_attendance = filtered_attendance[filtered_attendance["Date"] >= str(start_date)]
+    if end_date:
+        filtered_attendance = filtered_attendance[filtered_attendance["Date"] <= str(end_date)]
+    return filtered_attendance
+
+
+# Retention
+def retention_horizon(days=None):
+    # Rows dated before this day (YYYY-MM-DD) are archived; at least one day is kept so today's check-outs work
+    days = RETENTION_DAYS if days is None else int(days)
+    if days < 1:
+        raise ValueError("Retention must be at least one day")
+    return str(crm_data.now().date() - timedelta(days=days))
+
+
+def _drop_indexes(table):
+    # Archiving renumbers the table's rows, so its indexes are rebuilt on next use
+    for name, (indexed, _) in INDEXES.items():
+        if indexed == table:
+            _indexes.pop(name, None)
+
+
+@crm_metrics.timed()
+def compact_history(days=None):
+    # Returns the number of rows archived per table. The other functions may run meanwhile: the store's lock is
+    # only held for the start and the end of each table's archiving.
+    horizon = retention_horizon(days)
+    return {name: store.archive(name, horizon, _drop_indexes) for name in crm_data.ARCHIVED_TABLES}
+
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def start_background_compaction(interval=COMPACTION_INTERVAL):
+    # For processes without an event loop of their own (the Streamlit app): compacts at startup and then every
+    # interval seconds in a daemon thread. Only the first call in a process starts it.
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = threading.Thread(
+                target=asyncio.run, args=(crm_state.every(interval, compact_history, immediately=True),),
+                name="crm-compaction", daemon=True)
+            _compactor.start()
+    return _compactor
+
+
+def flush():
+    # Writes the changes queued with store.batch_writes; the state server calls this on a timer
+    with store.lock:
+        return store.flush()
+
+
+def _with_archive(name, include_archive, start_date, end_date):
+    # The hot table, preceded by the archived rows in the date range when include_archive is set
+    hot = getattr(store, name)
+    if not include_archive:
+        return hot
+    archived = store.archived(name, str(start_date)[:10] if start_date else None,
+                              str(end_date)[:10] if end_date else None)
+    return hot if archived.empty else pd.concat([archived, hot], ignore_index=True)
+
+
+# Multi-process deployment: with CRM_STATE_SOCKET set, every function below runs inside the state server
+# (crm_state.py), so all app processes share one copy of the data instead of each mutating its own.
+REMOTE_FUNCTIONS = [
+    "login", "register_user", "delete_user", "employee_names", "usernames", "table",
+    "record_action", "delete_all_login_logout_details", "filter_login_details", "daily_logs",
+    "add_tasks", "add_task", "update_task_status", "search_tasks", "employee_tasks", "delete_task_data",
+    "apply_for_leave", "pending_leaves", "employee_leaves", "update_leave_status",
+    "record_attendance_bulk", "add_attendance", "record_attendance", "today_attendance", "filter_attendance",
+    "compact_history", "leave_overlaps", "on_leave", "absences", "team_availability",
+]
+
+
+
+def _locked(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with store.lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+if crm_state.socket_path():
+    for _name in REMOTE_FUNCTIONS:
+        globals()[_name] = crm_state.remote(_name)
+else:
+    # Compaction runs in a background thread, and Streamlit runs each session in its own; every other function
+    # holds the store's lock, so it never sees a table half way through a change
+    for _name in REMOTE_FUNCTIONS:
+        if _name != "compact_history":
+            globals()[_name] = _locked(globals()[_name])
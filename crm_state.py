@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+
+import numpy as np
+import pandas as pd
+
+import crm_metrics
+
+DEFAULT_SOCKET = "/tmp/jobgenix_crm.sock"
+FLUSH_INTERVAL = 0.2  # seconds between batched writes to the CSV files
+logger = logging.getLogger("crm_state")
+MAX_MESSAGE = 256 * 2 ** 20
+
+# Errors the callers already handle (e.g. the API's bad-request middleware) are re-raised as the same type
+_ERRORS = {"KeyError": KeyError, "ValueError": ValueError, "TypeError": TypeError}
+
+
+class StateServiceError(RuntimeError):
+    pass
+
+
+def socket_path():
+    return os.environ.get("CRM_STATE_SOCKET")
+
+
+# Wire format: one JSON document per line. DataFrames travel in pandas' "split" layout so their index survives
+# (row labels are used to address tasks and leave applications); dates and anything else unknown become strings.
+def _encode(value):
+    if isinstance(value, pd.DataFrame):
+        return {"__frame__": value.to_dict("split")}
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return str(value)
+
+
+def _decode(document):
+    if "__frame__" in document:
+        split = document["__frame__"]
+        return pd.DataFrame(split["data"], index=split["index"], columns=split["columns"])
+    return document
+
+
+def _dumps(message):
+    return json.dumps(message, default=_encode).encode() + b"\n"
+
+
+# Client: one connection per thread, since Streamlit runs each session's script in its own thread
+_local = threading.local()
+
+
+def _connection():
+    if getattr(_local, "sock", None) is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path())
+        _local.sock, _local.reader = sock, sock.makefile("rb")
+    return _local.sock, _local.reader
+
+
+def _close():
+    sock = getattr(_local, "sock", None)
+    if sock is not None:
+        _local.reader.close()
+        sock.close()
+    _local.sock = _local.reader = None
+
+
+def call(fn, *args, **kwargs):
+    request = _dumps({"fn": fn, "args": args, "kwargs": kwargs})
+    sock, reader = _connection()
+    try:
+        sock.sendall(request)
+    except OSError:
+        # The server was restarted since this thread last used the connection; the request never arrived
+        _close()
+        sock, reader = _connection()
+        sock.sendall(request)
+    line = reader.readline()
+    if not line:
+        _close()
+        raise StateServiceError(f"State server closed the connection during {fn}")
+    response = json.loads(line, object_hook=_decode)
+    if response["ok"]:
+        return response["result"]
+    raise _ERRORS.get(response["type"], StateServiceError)(response["error"])
+
+
+def remote(name):
+    def proxy(*args, **kwargs):
+        return call(name, *args, **kwargs)
+    proxy.__name__ = name
+    return proxy
+
+
+# Server
+async def _handle(reader, writer, service):
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line, object_hook=_decode)
+                if request["fn"] not in service.REMOTE_FUNCTIONS:
+                    raise ValueError(f"Unknown function '{request['fn']}'")
+                with crm_metrics.span(f"state {request['fn']}"):
+                    result = getattr(service, request["fn"])(*request["args"], **request["kwargs"])
+                response = {"ok": True, "result": result}
+            except Exception as e:
+                response = {"ok": False, "type": type(e).__name__, "error": str(e)}
+            writer.write(_dumps(response))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def every(interval, fn, immediately=False, thread=False):
+    # Runs fn every interval seconds (starting right away with immediately) until cancelled; with thread, in a worker
+    # thread so the event loop keeps serving requests meanwhile. Also used by the API and the app for compaction.
+    # A failing run is logged and counted and the schedule carries on; a failed flush leaves its tables marked for
+    # a full rewrite, so the next run retries them.
+    if not immediately:
+        await asyncio.sleep(interval)
+    while True:
+        try:
+            with crm_metrics.span(f"scheduled {fn.__name__}"):
+                if thread:
+                    await asyncio.to_thread(fn)
+                else:
+                    fn()
+        except Exception:
+            logger.exception("Scheduled %s failed", fn.__name__)
+            crm_metrics.count("scheduled_errors", task=fn.__name__)
+        await asyncio.sleep(interval)
+
+
+async def serve(path, flush_interval=FLUSH_INTERVAL, compact_interval=None):
+    # Requests are handled one at a time on the event loop, so every mutation sees the previous one;
+    # the CSV writes they cause are coalesced and flushed every flush_interval seconds. Old login logs and
+    # attendance are archived at startup and every compact_interval seconds, in a worker thread.
+    os.environ.pop("CRM_STATE_SOCKET", None)  # this process owns the data, it must not proxy to itself
+    import crm_service as service
+    service.store.batch_writes = True
+    if os.path.exists(path):
+        os.remove(path)
+    server = await asyncio.start_unix_server(lambda r, w: _handle(r, w, service), path=path, limit=MAX_MESSAGE)
+    tasks = [asyncio.create_task(every(flush_interval, service.flush)),
+             asyncio.create_task(every(compact_interval or service.COMPACTION_INTERVAL, service.compact_history,
+                                       immediately=True, thread=True))]
+    logger.info("CRM state server listening on %s (data: %s)", path, os.path.abspath(service.store.data_dir))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        service.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the shared CRM state server.")
+    parser.add_argument("--socket", default=socket_path() or DEFAULT_SOCKET)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--compact-interval", type=float, help="seconds between archiving runs (default: hourly)")
+    parser.add_argument("--metrics-port", type=int, help="serve this process's metrics at http://127.0.0.1:PORT/metrics")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.metrics_port:
+        crm_metrics.serve_http(args.metrics_port)
+    try:
+        asyncio.run(serve(args.socket, args.flush_interval, args.compact_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
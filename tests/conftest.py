@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+
+# crm_service opens the store of CRM_DATA_DIR on import; point it away from the working directory before that
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CRM_DATA_DIR"] = tempfile.mkdtemp(prefix="crm_tests_")
+os.environ.pop("CRM_STATE_SOCKET", None)
+
+import pytest  # noqa: E402
+
+import crm_data  # noqa: E402
+import crm_service  # noqa: E402
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # crm_service on a fresh, empty data directory
+    monkeypatch.setattr(crm_service, "store", crm_data.DataStore(str(tmp_path)))
+    monkeypatch.setattr(crm_service, "_indexes", {})
+    return crm_service
+
+
+@pytest.fixture
+def employees(service):
+    for name in ["amy", "bob", "cat"]:
+        service.register_user(name, "pw", "employee")
+    return ["amy", "bob", "cat"]
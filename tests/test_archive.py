@@ -0,0 +1,87 @@
+import os
+import threading
+
+import pandas as pd
+
+import crm_data
+from crm_data.archive import LOCK_FILE, compaction_lock
+
+
+def _attendance(rows):
+    return pd.DataFrame(rows, columns=crm_data.ATTENDANCE_COLUMNS)
+
+
+def test_archive_moves_old_rows_into_monthly_segments(tmp_path):
+    store = crm_data.DataStore(str(tmp_path))
+    store.append("attendance", _attendance([
+        ["amy", "2026-01-05", "09:00:00", "17:00:00", "Checked Out"],
+        ["amy", "2026-02-05", "09:00:00", "17:00:00", "Checked Out"],
+        ["amy", "2026-10-18", "09:00:00", "", "Checked In"],
+    ]))
+    assert store.archive("attendance", "2026-10-01") == 2
+    assert sorted(os.listdir(tmp_path / "archive" / "attendance")) == ["2026-01.0.csv.gz", "2026-02.0.csv.gz"]
+    assert store.attendance["Date"].tolist() == ["2026-10-18"]
+    assert crm_data.DataStore(str(tmp_path)).attendance["Date"].tolist() == ["2026-10-18"]
+    assert store.archived("attendance", "2026-02-01", "2026-02-28")["Date"].tolist() == ["2026-02-05"]
+
+
+def test_rows_written_back_by_a_stale_process_are_not_archived_twice(tmp_path):
+    first = crm_data.DataStore(str(tmp_path))
+    first.append("attendance", _attendance([["amy", "2026-01-01", "09:00:00", "", "Checked In"]]))
+    second = crm_data.DataStore(str(tmp_path))
+    second.load("attendance")
+
+    assert first.archive("attendance", "2026-10-01") == 1
+    # The second process still holds the archived row and writes it back with its next full save
+    second.attendance.at[0, "Check-Out Time"] = "17:00:00"
+    second.attendance.at[0, "Status"] = "Checked Out"
+    second.save("attendance")
+    second.append("attendance", _attendance([["bob", "2026-01-02", "09:00:00", "", "Checked In"]]))
+    second.archive("attendance", "2026-10-01")
+
+    assert sorted(second.archived("attendance")["Username"]) == ["amy", "bob"]
+    assert crm_data.DataStore(str(tmp_path)).attendance.empty
+
+
+def test_identical_rows_are_skipped_when_archived_again(tmp_path):
+    first = crm_data.DataStore(str(tmp_path))
+    first.append("attendance", _attendance([["amy", "2026-01-01", "09:00:00", "", "Checked In"]]))
+    second = crm_data.DataStore(str(tmp_path))
+    second.load("attendance")
+    first.archive("attendance", "2026-10-01")
+    second.save("attendance")  # stale copy puts the row back into the hot file
+    assert second.archive("attendance", "2026-10-01") == 1
+    assert len(second.archived("attendance")) == 1
+    assert os.listdir(tmp_path / "archive" / "attendance") == ["2026-01.0.csv.gz"]
+
+
+def test_only_one_process_compacts_a_directory(tmp_path):
+    store = crm_data.DataStore(str(tmp_path))
+    store.append("attendance", _attendance([["amy", "2026-01-01", "09:00:00", "", "Checked In"]]))
+    with compaction_lock(str(tmp_path)) as acquired:
+        assert acquired
+        assert store.archive("attendance", "2026-10-01") == 0
+    assert not os.path.exists(tmp_path / "archive" / LOCK_FILE)
+    assert store.archive("attendance", "2026-10-01") == 1
+
+
+def test_service_keeps_working_while_segments_are_written(service, employees, monkeypatch):
+    service.store.append("logs", [["amy", "Login", "2026-01-01 09:00:00"]])
+    started, release = threading.Event(), threading.Event()
+    write_segments = crm_data.store.write_segments
+
+    def slow_write_segments(*args):
+        started.set()
+        assert release.wait(5)
+        return write_segments(*args)
+
+    monkeypatch.setattr(crm_data.store, "write_segments", slow_write_segments)
+    compaction = threading.Thread(target=service.compact_history)
+    compaction.start()
+    assert started.wait(5)
+    service.record_action("bob", "Login")  # would deadlock if compaction held the store's lock
+    release.set()
+    compaction.join(5)
+    assert service.store.logs["Username"].tolist() == ["bob"]
+    assert crm_data.DataStore(str(service.store.data_dir)).logs["Username"].tolist() == ["bob"]
+    assert service.store.archived("logs")["Username"].tolist() == ["amy"]
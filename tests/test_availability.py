@@ -0,0 +1,99 @@
+import asyncio
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from crm_availability import AbsenceIndex, IntervalTree, LeaveIndex
+
+
+def _day(offset):
+    return str(date(2026, 1, 1) + timedelta(days=offset))
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    tree, stored = IntervalTree(), {}
+    for key in range(2000):
+        if stored and rng.random() < 0.3:
+            removed = rng.choice(sorted(stored))
+            assert tree.remove(stored.pop(removed)[0], removed)
+        else:
+            start = rng.randrange(365)
+            stored[key] = (_day(start), _day(start + rng.randrange(20)))
+            tree.insert(*stored[key], key)
+        if key % 50 == 0:
+            start = rng.randrange(365)
+            query = (_day(start), _day(start + rng.randrange(30)))
+            expected = sorted(((s, e, k) for k, (s, e) in stored.items() if s <= query[1] and e >= query[0]),
+                              key=lambda found: (found[0], found[2]))
+            assert tree.overlapping(*query) == expected
+    assert len(tree) == len(stored)
+    assert not tree.remove(_day(0), -1)
+
+
+def test_leave_index_follows_status_changes():
+    leave = pd.DataFrame({"Start Date": ["2026-03-01", "2026-03-05"], "End Date": ["2026-03-03", "2026-03-06"],
+                          "Status": ["Accepted", "Rejected"]})
+    index = LeaveIndex(leave)
+    assert index.overlapping("2026-03-03", "2026-03-05") == [0]
+    index.update(1, "2026-03-05", "2026-03-06", "Pending")
+    index.update(0, "2026-03-01", "2026-03-03", "Rejected")
+    assert index.overlapping("2026-03-01", "2026-03-31") == [1]
+
+
+def test_absence_index_splits_gaps():
+    attendance = pd.DataFrame({"Username": ["amy", "amy", "bob"], "Date": ["2026-03-01", "2026-03-10", "2026-03-05"]})
+    index = AbsenceIndex(attendance)
+    assert index.overlapping("2026-03-01", "2026-03-31") == [("amy", "2026-03-02", "2026-03-09")]
+    index.add("amy", "2026-03-05")
+    index.add("amy", "2026-03-06")
+    index.add("bob", "2026-03-07")
+    assert index.overlapping("2026-03-01", "2026-03-31") == [
+        ("amy", "2026-03-02", "2026-03-04"), ("bob", "2026-03-06", "2026-03-06"), ("amy", "2026-03-07", "2026-03-09")]
+
+
+def test_overlapping_leave_is_rejected(service, employees):
+    assert service.apply_for_leave("amy", "Sick Leave", "2026-03-02", "2026-03-04")[0]
+    ok, message = service.apply_for_leave("amy", "Casual Leave", "2026-03-04", "2026-03-06")
+    assert not ok and "2026-03-02 to 2026-03-04" in message
+    assert service.apply_for_leave("bob", "Casual Leave", "2026-03-04", "2026-03-06")[0]
+    with pytest.raises(ValueError):
+        service.apply_for_leave("amy", "Casual Leave", "2026-03-10", "2026-03-09")
+    service.update_leave_status(0, "Rejected")
+    assert service.apply_for_leave("amy", "Casual Leave", "2026-03-04", "2026-03-06")[0]
+
+
+def test_on_leave_and_team_availability(service, employees):
+    service.apply_for_leave("amy", "Sick Leave", "2026-03-02", "2026-03-04")
+    service.apply_for_leave("bob", "Casual Leave", "2026-03-04", "2026-03-04")
+    service.update_leave_status(1, "Accepted")
+    assert list(service.on_leave("2026-03-03")["Employee Name"]) == ["amy"]
+    assert list(service.on_leave("2026-03-04", include_pending=False)["Employee Name"]) == ["bob"]
+    service.add_attendance(pd.DataFrame([["cat", "2026-03-01", "09:00:00", "", "Checked In"],
+                                         ["cat", "2026-03-05", "09:00:00", "", "Checked In"]],
+                                        columns=service.ATTENDANCE_COLUMNS))
+    assert service.team_availability("2026-03-04") == {"employees": 3, "out": 2, "available": 1,
+                                                       "out_names": ["amy", "bob"]}
+    assert service.team_availability("2026-03-04", include_absences=True)["out_names"] == ["amy", "bob", "cat"]
+
+
+def test_leave_api_status_codes(service, employees):
+    import crm_api
+
+    async def post(client, start, end, employee="amy", leave_type="Sick Leave"):
+        response = await client.post("/leave", json={"employee_name": employee, "leave_type": leave_type,
+                                                      "start_date": start, "end_date": end})
+        return response.status
+
+    async def run():
+        async with TestClient(TestServer(crm_api.create_app())) as client:
+            return [await post(client, "2026-03-02", "2026-03-04"), await post(client, "2026-03-03", "2026-03-05"),
+                    await post(client, "2026-03-09", "2026-03-08"), await post(client, "soon", "2026-03-08"),
+                    await post(client, "2026-04-01", "2026-04-01", employee="nobody"),
+                    await post(client, "2026-04-01", "2026-04-01", leave_type="Whatever")]
+
+    assert asyncio.run(run()) == [200, 409, 400, 400, 400, 400]
+    assert len(service.store.leave) == 1
@@ -0,0 +1,49 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+import crm_data
+import crm_export
+
+
+def _frame(rows=5):
+    return pd.DataFrame([[f"user{i}", "2026-10-19", "09:00:00", "" if i % 2 else "17:00:00",
+                          "Checked In" if i % 2 else "Checked Out"] for i in range(rows)],
+                        columns=crm_data.ATTENDANCE_COLUMNS)
+
+
+def _read(data, fmt):
+    if fmt == "xlsx":
+        return pd.read_excel(io.BytesIO(data), dtype=str).fillna("")
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("fmt", crm_export.FORMATS)
+@pytest.mark.parametrize("compress", [False, True])
+def test_exports_round_trip(fmt, compress):
+    frame = _frame()
+    chunks = list(crm_export.export_chunks(frame, fmt, compress, chunksize=2))
+    data = b"".join(chunks)
+    if compress:
+        assert data[:2] == b"\x1f\x8b"
+        data = gzip.decompress(data)
+    elif fmt == "csv":
+        assert len(chunks) == 4  # header, then three chunks of at most two rows
+    pd.testing.assert_frame_equal(_read(data, fmt), frame)
+
+
+def test_empty_tables_export_their_header(tmp_path):
+    size = crm_export.export_to_file(_frame(0), tmp_path / "empty.csv.gz", compress=True)
+    assert size == (tmp_path / "empty.csv.gz").stat().st_size
+    assert gzip.decompress((tmp_path / "empty.csv.gz").read_bytes()).decode().strip() == \
+        ",".join(crm_data.ATTENDANCE_COLUMNS)
+
+
+def test_export_names_and_types():
+    assert crm_export.export_filename("logs", "xlsx", True) == "logs_export.xlsx.gz"
+    assert crm_export.export_mime_type("csv") == "text/csv"
+    assert crm_export.export_mime_type("xlsx", True) == "application/gzip"
+    with pytest.raises(ValueError):
+        crm_export.export_chunks(_frame(), "json")
@@ -0,0 +1,68 @@
+import asyncio
+import io
+import threading
+
+import pandas as pd
+from aiohttp.test_utils import TestClient, TestServer
+
+import crm_api
+import crm_data
+import crm_import
+
+
+def test_rejected_rows_are_numbered_by_file_line(service, employees):
+    upload = io.BytesIO(b"Username,Date,Check-In Time,Check-Out Time\n"
+                        b"amy,2026-10-01,09:00,17:00\n"
+                        b"\n"
+                        b"bob,2026-10-01,09:00,\n"
+                        b"zed,2026-10-01,09:00,\n"
+                        b",,,\n"
+                        b"cat,2026-10-01,09:00,08:00\n")
+    summary = crm_import.import_attendance(upload, "attendance.csv", chunksize=2)
+    assert summary["imported"] == 2
+    assert summary["rejected_rows"].to_dict("records") == [
+        {"Row": 3, "Reason": "Empty row"},
+        {"Row": 5, "Reason": "Unknown user"},
+        {"Row": 6, "Reason": "Empty row"},
+        {"Row": 7, "Reason": "Check-Out Time is before Check-In Time"},
+    ]
+
+
+def test_empty_task_rows_are_rejected(service, employees):
+    chunk = pd.DataFrame([[""] * 7, ["Report", "High", "amy", "Staff", "Done", "2026-10-01", "2026-10-02"]],
+                         columns=crm_data.TASK_COLUMNS)
+    valid, rejected = crm_import.validate_tasks(chunk)
+    assert list(valid.index) == [3]
+    assert rejected.to_dict("records") == [{"Row": 2, "Reason": "Empty row"}]
+
+
+def test_imported_tasks_are_validated_once(service, employees, monkeypatch):
+    calls = []
+    validate_tasks = crm_import.validate_tasks
+    monkeypatch.setattr(crm_import, "validate_tasks", lambda chunk, first_row: calls.append(first_row) or
+                        validate_tasks(chunk, first_row))
+    upload = io.BytesIO(b"Task,Priority,Employee Name,Employee Role,Status,Start Date,End Date\n"
+                        b"Report,High,amy,Staff,Done,2026-10-01,2026-10-02\n"
+                        b"Review,low,bob,staff,done,01/10/2026,2026-10-03\n"
+                        b"Plan,High,zed,Staff,Done,2026-10-01,2026-10-02\n")
+    summary = crm_import.import_tasks(upload, "tasks.csv", chunksize=2)
+    assert calls == [2, 4]
+    assert summary["imported"] == 2
+    assert summary["rejected_rows"].to_dict("records") == [{"Row": 4, "Reason": "Unknown employee"}]
+    assert service.store.tasks["Priority"].tolist() == ["High", "Low"]
+
+
+def test_api_imports_run_off_the_event_loop(service, employees, monkeypatch):
+    threads = []
+    import_attendance = crm_import.import_attendance
+    monkeypatch.setattr(crm_import, "import_attendance", lambda *args: threads.append(threading.current_thread())
+                        or import_attendance(*args))
+
+    async def run():
+        async with TestClient(TestServer(crm_api.create_app())) as client:
+            response = await client.post("/import/attendance?filename=a.csv",
+                                         data=b"Username,Date,Check-In Time\namy,2026-10-01,09:00\n")
+            return await response.json()
+
+    assert asyncio.run(run())["imported"] == 1
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,37 @@
+import socket
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+import crm_metrics
+
+
+def test_metrics_are_served_over_http(monkeypatch):
+    monkeypatch.setattr(crm_metrics, "_http_server", None)
+    monkeypatch.setattr(crm_metrics, "enabled", True)
+    server = crm_metrics.serve_http(0)
+    try:
+        assert crm_metrics.serve_http(0) is server
+        crm_metrics.observe("page Dashboard", 0.25)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert 'crm_span_seconds_count{span="page Dashboard"}' in response.read().decode()
+        with pytest.raises(HTTPError):
+            urlopen(url + "/")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_a_busy_port_is_reported_once(monkeypatch, caplog):
+    monkeypatch.setattr(crm_metrics, "_http_server", None)
+    monkeypatch.setattr(crm_metrics, "_http_failed", False)
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        port = busy.getsockname()[1]
+        assert crm_metrics.serve_http(port) is None
+        assert crm_metrics.serve_http(port) is None
+    assert len([r for r in caplog.records if r.name == "crm_metrics"]) == 1
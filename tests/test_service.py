@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+import crm_data
+
+
+def _attendance_file(service):
+    return pd.read_csv(service.store.path("attendance.csv"), dtype=str, keep_default_na=False)
+
+
+def test_check_out_and_check_in_in_one_batch_are_both_written(service, employees):
+    service.record_attendance_bulk([{"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T09:00:00"}])
+    results = service.record_attendance_bulk([
+        {"username": "amy", "action": "Check-Out", "timestamp": "2026-10-19T17:00:00"},
+        {"username": "bob", "action": "Check-In", "timestamp": "2026-10-19T09:30:00"},
+    ])
+    assert [ok for ok, _ in results] == [True, True]
+    on_file = _attendance_file(service).set_index("Username")
+    assert on_file.at["amy", "Check-Out Time"] == "17:00:00"
+    assert on_file.at["amy", "Status"] == "Checked Out"
+    assert on_file.at["bob", "Status"] == "Checked In"
+
+
+def test_mixed_batch_reaches_disk_with_batch_writes(service, employees):
+    service.store.batch_writes = True
+    service.record_attendance_bulk([{"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T09:00:00"}])
+    service.store.flush()
+    service.record_attendance_bulk([
+        {"username": "amy", "action": "Check-Out", "timestamp": "2026-10-19T17:00:00"},
+        {"username": "bob", "action": "Check-In", "timestamp": "2026-10-19T09:30:00"},
+    ])
+    service.store.flush()
+    on_file = _attendance_file(service)
+    assert len(on_file) == 2
+    assert on_file.set_index("Username").at["amy", "Check-Out Time"] == "17:00:00"
+    assert list(on_file.columns) == crm_data.ATTENDANCE_COLUMNS
+
+
+def test_attendance_index_follows_appends_and_imports(service, employees):
+    assert service.record_attendance_bulk([
+        {"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T09:00:00"},
+        {"username": "amy", "action": "Check-Out", "timestamp": "2026-10-19T17:00:00"},
+    ]) == [(True, "Successfully checked in!"), (True, "Successfully checked out!")]
+    added, duplicates = service.add_attendance(pd.DataFrame(
+        [["bob", "2026-10-18", "09:00:00", "", "Checked In"], ["amy", "2026-10-19", "09:00:00", "", "Checked In"]],
+        columns=crm_data.ATTENDANCE_COLUMNS))
+    assert (added, duplicates) == (1, [1])
+    ok, message = service.record_attendance_bulk(
+        [{"username": "bob", "action": "Check-Out", "timestamp": "2026-10-18T18:00:00"}])[0]
+    assert ok
+    keys = service._index("attendance")
+    assert keys == service.AttendanceKeys(service.store.attendance)
+    assert service.store.attendance.at[keys[("bob", "2026-10-18")], "Check-Out Time"] == "18:00:00"
+    assert service.record_attendance_bulk(
+        [{"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T10:00:00"}])[0][0] is False
+
+
+def test_tasks_are_validated(service, employees):
+    assert service.add_task("Report", "High", "amy", "Staff", "To be Done", "2026-10-01", "2026-10-05") == \
+        (True, "Task added!")
+    assert service.add_task("Report", "Urgent", "amy", "Staff", "To be Done", "2026-10-01", "2026-10-05") == \
+        (False, "Invalid priority!")
+    assert service.add_task("Report", "High", "zed", "Staff", "To be Done", "2026-10-01", "2026-10-05") == \
+        (False, "Unknown employee!")
+    assert service.add_task("Report", "High", "amy", "Staff", "To be Done", "soon", "2026-10-05") == \
+        (False, "Invalid date!")
+    added, rejected = service.add_tasks([
+        ["A", "Low", "bob", "Intern", "Done", "2026-10-01", "2026-10-01"],
+        ["B", "Low", "bob", "Chief", "Done", "2026-10-01", "2026-10-01"],
+        ["C", "Low", "bob", "Intern", "Done", "2026-10-05", "2026-10-01"],
+    ])
+    assert added == 1
+    assert rejected.to_dict("list") == {"Row": [1, 2],
+                                        "Reason": ["Invalid employee role", "End Date is before Start Date"]}
+    assert service.table("tasks")["Task"].tolist() == ["Report", "A"]
+
+
+def test_task_status_must_be_known(service, employees):
+    service.add_task("Report", "High", "amy", "Staff", "To be Done", "2026-10-01", "2026-10-05")
+    assert service.update_task_status(0, "Done")
+    assert not service.update_task_status(5, "Done")
+    with pytest.raises(ValueError):
+        service.update_task_status(0, "Whenever")
+
+
+def test_attendance_for_unknown_users_is_rejected(service, employees):
+    assert service.record_attendance("zed", "Check-In") == (False, "Unknown user 'zed'.")
+    assert service.store.attendance.empty
+
+
+def test_timezone_aware_timestamps_are_recorded_in_ist(service, employees):
+    assert service.record_attendance_bulk(
+        [{"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T20:00:00Z"}])[0][0]
+    assert service.store.attendance.iloc[0][["Date", "Check-In Time"]].tolist() == ["2026-10-20", "01:30:00"]
+
+
+def test_a_data_directory_has_one_owner(tmp_path):
+    owner = crm_data.claim(str(tmp_path))
+    with pytest.raises(crm_data.DataDirectoryInUse):
+        crm_data.claim(str(tmp_path))
+    owner.close()
+    crm_data.claim(str(tmp_path)).close()
+
+
+def test_check_out_cannot_precede_check_in(service, employees):
+    assert service.record_attendance_bulk([
+        {"username": "amy", "action": "Check-In", "timestamp": "2026-10-19T09:00:00"},
+        {"username": "amy", "action": "Check-Out", "timestamp": "2026-10-19T08:00:00"},
+        {"username": "bob", "action": "Check-In", "timestamp": "2026-10-18T09:00:00"},
+    ])[1] == (False, "Check-Out Time is before Check-In Time!")
+    ok, message = service.record_attendance_bulk(
+        [{"username": "bob", "action": "Check-Out", "timestamp": "2026-10-18T08:59:00"}])[0]
+    assert not ok and service.store.attendance["Check-Out Time"].tolist() == ["", ""]
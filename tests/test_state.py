@@ -0,0 +1,65 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import crm_data
+import crm_state
+
+
+def test_frames_survive_the_wire_format():
+    frame = pd.DataFrame({"Task": ["a", "b"], "Status": ["Done", ""]}, index=[3, 7])
+    message = json.loads(crm_state._dumps({"result": [frame, 1]}), object_hook=crm_state._decode)
+    pd.testing.assert_frame_equal(message["result"][0], frame, check_dtype=False)
+
+
+def test_a_failed_flush_is_retried_in_full(tmp_path, monkeypatch):
+    store = crm_data.DataStore(str(tmp_path), batch_writes=True)
+    store.append("logs", [["amy", "Login", "2026-10-19 09:00:00"]])
+    store.append("tasks", [["T", "High", "amy", "Staff", "Done", "2026-10-01", "2026-10-02"]])
+    write_rows = store._write_rows
+
+    def disk_full(name, rows, header):
+        if name == "logs":
+            raise OSError("No space left on device")
+        return write_rows(name, rows, header)
+
+    monkeypatch.setattr(store, "_write_rows", disk_full)
+    with pytest.raises(OSError):
+        store.flush()
+    assert store._dirty == {"logs"}
+    assert len(pd.read_csv(store.path("tasks.csv"))) == 1  # the other table was still written
+
+    monkeypatch.undo()
+    store.flush()
+    assert pd.read_csv(store.path("login_logout.csv"))["Username"].tolist() == ["amy"]
+
+
+def test_scheduled_tasks_keep_running_after_an_error():
+    calls = []
+
+    def flaky():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    async def run():
+        task = asyncio.create_task(crm_state.every(0.01, flaky, immediately=True))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(calls) > 2
+
+
+def test_clients_of_the_state_server_open_no_data(tmp_path):
+    env = {**os.environ, "CRM_STATE_SOCKET": str(tmp_path / "crm.sock"), "CRM_DATA_DIR": str(tmp_path / "data")}
+    env["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         env.get("PYTHONPATH", "")])
+    subprocess.run([sys.executable, "-c", "import crm_service; assert crm_service.store is None"],
+                   cwd=tmp_path, env=env, check=True)
+    assert os.listdir(tmp_path) == []